@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# Copyright NVIDIA CORPORATION
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark generate-image-list.py against an in-process stand-in registry.
+
+Points the chart's values.yaml at the registry from stand_in_registry.py and
+times each stage (tag pagination, OS-variant expansion, digest resolution,
+size estimation and the whole command line) with a cold registry client.  For
+every scenario in the tag count x page size x latency matrix it records the
+wall time, the registry requests by kind and the peak Python heap, and writes
+the results as JSON so they can be tracked over time.
+
+Usage:
+    python3 benchmark-image-list.py [--tags N[,N…]] [--latency S[,S…]] [--output PATH]
+
+Run with --help for the full list of options.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import yaml
+except ImportError:
+    print("Error: PyYAML is required. Install it with: pip install pyyaml", file=sys.stderr)
+    sys.exit(1)
+
+# image_list needs PyYAML as well, so it is imported after the check above
+import image_list  # noqa: E402
+from stand_in_registry import StandInRegistry  # noqa: E402
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CHART_DIR = os.path.join(SCRIPT_DIR, "..", "..", "deployments", "gpu-operator")
+
+STAGES = ("tags", "os-variants", "resolve-digests", "estimate", "cli")
+
+# OS suffixes published for every OS-variant version, in the order they are used.
+_OS_SUFFIXES = (
+    "ubuntu22.04", "ubuntu24.04", "ubuntu20.04", "rhel9.4", "rhel9.6", "rhel8.10",
+    "rhcos4.16", "rhcos4.18", "rocky9", "sles15.6", "rhel10", "debian12",
+)
+
+
+# ---------------------------------------------------------------------------
+# Scenario setup
+# ---------------------------------------------------------------------------
+
+def _prepare_values(registry: StandInRegistry, tag_count: int, os_components: int,
+                    os_variants: int, work_dir: str) -> str:
+    """Point values.yaml at the stand-in registry and publish matching tags.
+
+    Adds os_components synthetic OS-variant components (values blocks plus
+    component table entries) and returns the path of the rewritten values file.
+    """
+    with open(os.path.join(CHART_DIR, "values.yaml")) as file_handle:
+        values = yaml.safe_load(file_handle.read().replace("nvcr.io", registry.host))
+
+    components = tuple(
+        component for component in image_list._OPERATOR_COMPONENTS
+        if not component.values_path.startswith("benchmark")
+    )
+    for index in range(os_components):
+        values_path = f"benchmarkOsComponent{index}"
+        values[values_path] = {
+            "repository": f"{registry.host}/nvidia/benchmark",
+            "image": f"os-component-{index}",
+            "version": "1.0.0",
+        }
+        components += (image_list._Component(values_path, os_variants=True),)
+    image_list._OPERATOR_COMPONENTS = components
+
+    chart = image_list._load_yaml(os.path.join(CHART_DIR, "Chart.yaml"))
+    entries, lookups = image_list._plan_operator_images(values, chart["appVersion"])
+    registry.tags.clear()
+    for entry in entries:
+        _, namespace, tag = image_list._split_ref(entry.reference)
+        registry.tags.setdefault(namespace, []).append(tag)
+    for _, namespace, version, _ in lookups:
+        tags = [f"{version}-{suffix}" for suffix in _OS_SUFFIXES[:os_variants]]
+        tags += [f"{tag}.sbom" for tag in tags]
+        # Older releases fill the rest of the namespace
+        filler = 0
+        while len(tags) < tag_count:
+            tags.append(f"{filler // 100}.{filler % 100}.0-{_OS_SUFFIXES[filler % len(_OS_SUFFIXES)]}")
+            filler += 1
+        registry.tags[namespace] = tags
+    for namespace, tags in registry.tags.items():
+        registry.tags[namespace] = sorted(set(tags))
+
+    values_path = os.path.join(work_dir, "values.yaml")
+    with open(values_path, "w") as file_handle:
+        yaml.safe_dump(values, file_handle)
+    return values_path
+
+
+def _stage_runner(stage: str, registry: StandInRegistry, values_path: str, jobs: int,
+                  work_dir: str):
+    """Return a zero-argument callable running stage once with a cold client."""
+    values = image_list._load_yaml(values_path)
+    app_version = image_list._load_yaml(os.path.join(CHART_DIR, "Chart.yaml"))["appVersion"]
+    _, lookups = image_list._plan_operator_images(values, app_version)
+
+    def client():
+        return image_list._RegistryClient(retries=0, plain_http_hosts=[registry.host])
+
+    def listed_entries():
+        with client() as registry_client:
+            return image_list._extract_operator_entries(
+                values, app_version, False, None, jobs, registry_client
+            )
+
+    if stage == "tags":
+        def run():
+            with client() as registry_client:
+                for registry_host, namespace, _, _ in lookups:
+                    registry_client.fetch_all_tags(registry_host, namespace)
+        return run
+    if stage == "os-variants":
+        return listed_entries
+    if stage in ("resolve-digests", "estimate"):
+        entries = listed_entries()
+        images = sorted({entry.reference for entry in entries})
+
+        def run():
+            with client() as registry_client:
+                if stage == "resolve-digests":
+                    image_list._pin_digests(images, registry_client, jobs)
+                else:
+                    image_list._estimate_transfer(entries, registry_client, jobs)
+        return run
+    if stage == "cli":
+        argv = [
+            "--values", values_path, "--no-nfd", "--retries", "0",
+            "--insecure-registry", registry.host, "--jobs", str(jobs),
+            "--output", os.path.join(work_dir, "images.txt"),
+        ]
+
+        def run():
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+                image_list.main(argv)
+        return run
+    raise ValueError(f"unknown stage {stage!r}")
+
+
+def _measure(run, registry: StandInRegistry, repeat: int) -> dict:
+    wall_times = []
+    for iteration in range(repeat):
+        registry.reset_counters()
+        start = time.perf_counter()
+        run()
+        wall_times.append(time.perf_counter() - start)
+        if iteration == 0:
+            requests = dict(registry.counts)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_seconds": {
+            "min": min(wall_times),
+            "median": statistics.median(wall_times),
+            "max": max(wall_times),
+        },
+        "requests": {"total": sum(requests.values()), **requests},
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def _float_list(value: str) -> list[float]:
+    return [float(item) for item in value.split(",") if item]
+
+
+def _stage_list(value: str) -> list[str]:
+    stages = [item for item in value.split(",") if item]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s): {', '.join(unknown)}")
+    return stages
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark generate-image-list.py against an in-process stand-in registry.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--tags", type=_int_list, default=[1000, 10000], metavar="N[,N…]",
+                        help="Tags per OS-variant namespace")
+    parser.add_argument("--page-size", type=_int_list, default=[100], metavar="N[,N…]",
+                        help="Maximum tags per tags/list page")
+    parser.add_argument("--latency", type=_float_list, default=[0.0, 0.02], metavar="S[,S…]",
+                        help="Seconds of latency added to every registry request")
+    parser.add_argument("--os-components", type=_int_list, default=[0], metavar="N[,N…]",
+                        help="Extra synthetic OS-variant components")
+    parser.add_argument("--os-variants", type=int, default=8, metavar="N",
+                        help=f"OS variants per component version (max {len(_OS_SUFFIXES)})")
+    parser.add_argument("--stages", type=_stage_list, default=list(STAGES), metavar="NAME[,…]",
+                        help=f"Stages to run ({', '.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=3, metavar="N",
+                        help="Timed runs per stage")
+    parser.add_argument("--jobs", type=int, default=8, metavar="N",
+                        help="--jobs passed to the generator")
+    parser.add_argument("--output", default=None, metavar="PATH",
+                        help="Write JSON results to PATH instead of stdout")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if not 1 <= args.os_variants <= len(_OS_SUFFIXES):
+        parser.error(f"--os-variants must be between 1 and {len(_OS_SUFFIXES)}")
+    return args
+
+
+def main() -> None:
+    args = _parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for tag_count in args.tags:
+            for page_size in args.page_size:
+                for latency in args.latency:
+                    for os_components in args.os_components:
+                        scenario = {
+                            "tags": tag_count,
+                            "page_size": page_size,
+                            "latency": latency,
+                            "os_components": os_components,
+                            "os_variants": args.os_variants,
+                            "jobs": args.jobs,
+                        }
+                        registry = StandInRegistry(latency, page_size)
+                        try:
+                            values_path = _prepare_values(
+                                registry, tag_count, os_components,
+                                args.os_variants, work_dir,
+                            )
+                            for stage in args.stages:
+                                run = _stage_runner(
+                                    stage, registry, values_path, args.jobs, work_dir
+                                )
+                                result = {"scenario": scenario, "stage": stage,
+                                          **_measure(run, registry, args.repeat)}
+                                results.append(result)
+                                print(f"{stage:<16} tags={tag_count:<6} page={page_size:<5} "
+                                      f"latency={latency:<5} os-components={os_components:<3} "
+                                      f"{result['wall_seconds']['median']:8.3f}s "
+                                      f"{result['requests']['total']:6d} requests "
+                                      f"{result['peak_memory_bytes'] / (1 << 20):8.1f} MiB",
+                                      file=sys.stderr)
+                        finally:
+                            registry.close()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        # KiB on Linux: the resident peak of the whole benchmark process
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+    output_text = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w") as file_handle:
+            file_handle.write(output_text)
+    else:
+        sys.stdout.write(output_text)
+
+
+if __name__ == "__main__":
+    main()
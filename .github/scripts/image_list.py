@@ -0,0 +1,3871 @@
+# Copyright NVIDIA CORPORATION
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Generate the list of container images the GPU Operator can deploy.
+
+This module implements generate-image-list.py, whose command line is main();
+see that script for an overview.  It is also the importable API for release
+tooling that would otherwise start the script once per query:
+
+    import sys
+    sys.path.insert(0, ".github/scripts")
+    import image_list
+
+    with image_list.ImageListGenerator(cache_dir=".cache/images") as generator:
+        for overlay in ("ubuntu.yaml", {"driver": {"version": "580.95.05"}}):
+            result = generator.images(overlay, os=["ubuntu*"])
+            print(result.images)
+        print(generator.os_variants("nvcr.io/nvidia/driver", "580.95.05"))
+
+A generator keeps parsed chart files, pull tokens, connections and tag lists
+warm between calls and is safe to share between threads.  Each method has an
+async variant (images_async, os_variants_async) that runs it in a worker
+thread, and generate_image_list() is the one-shot form.
+
+Options use the command-line flag names with underscores (values, chart,
+nfd_values, no_nfd, skip_registry, cache_dir, cache_ttl, offline, jobs,
+retries, retry_backoff, insecure_registry, discover, discover_path).  The
+per-call options (os, exclude_os, kernel, nodes_json, platforms,
+resolve_digests, expand_platforms, driver_versions, gds_versions,
+gdrcopy_versions, values, chart, gpu_operator_version) can also be given to the
+constructor as defaults; list options given per call replace the default, and
+a single string is taken as a one-item list.  Invalid options raise ValueError.
+
+For a long-running service shared by several tools, see the serve command of
+generate-image-list.py.
+"""
+
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import contextlib
+import csv
+import fnmatch
+import hashlib
+import http.client
+import http.server
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from typing import NamedTuple
+
+import yaml
+
+
+# Default upper bound on concurrent registry lookups (one per OS-specific component).
+DEFAULT_REGISTRY_WORKERS = 8
+
+# Default age (in seconds) after which a cached tag list is revalidated.
+DEFAULT_CACHE_TTL = 3600
+
+# Registry HTTP client defaults.
+DEFAULT_REQUEST_TIMEOUT = 15
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5
+# Token lifetime assumed when the realm omits expires_in (per the distribution spec).
+DEFAULT_TOKEN_LIFETIME = 60
+# Renew tokens this many seconds before they expire.
+TOKEN_EXPIRY_MARGIN = 10
+_RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Address the serve command listens on unless --listen says otherwise.
+DEFAULT_LISTEN = "127.0.0.1:8750"
+
+# Output formats and the file extension batch mode uses for each.
+OUTPUT_FORMATS = {
+    "text": ".txt",
+    "json": ".json",
+    "yaml": ".yaml",
+    "csv": ".csv",
+    "skopeo-sync": ".skopeo.yaml",
+}
+
+_INDEX_MEDIA_TYPES = frozenset({
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+})
+_MANIFEST_ACCEPT = ", ".join([
+    *sorted(_INDEX_MEDIA_TYPES),
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+])
+
+
+# ---------------------------------------------------------------------------
+# YAML helpers
+# ---------------------------------------------------------------------------
+
+class _InputError(ValueError):
+    """A values, chart or overlay file cannot be used."""
+
+
+def _load_yaml(path: str) -> dict:
+    with open(path) as file_handle:
+        document = yaml.safe_load(file_handle) or {}
+    if not isinstance(document, dict):
+        raise _InputError(f"{path}: expected a YAML mapping, got {type(document).__name__}")
+    return document
+
+
+def _deep_merge(base: dict, overlay: dict) -> dict:
+    """Return base with overlay merged on top, following Helm's values semantics.
+
+    Maps are merged recursively; lists and scalars in overlay replace the base
+    value; a null in overlay removes the key.
+    """
+    merged = dict(base)
+    for key, value in overlay.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _combine_overlays(first: dict, second: dict) -> dict:
+    """Combine two overlays the way Helm combines `-f first -f second`.
+
+    Unlike _deep_merge, a null in second is kept (replacing whatever first had),
+    so that it still removes the key when the result is merged onto the chart
+    values.
+    """
+    combined = dict(first)
+    for key, value in second.items():
+        if isinstance(value, dict) and isinstance(combined.get(key), dict):
+            combined[key] = _combine_overlays(combined[key], value)
+        else:
+            combined[key] = value
+    return combined
+
+
+def _load_overlay(path: str) -> dict:
+    """Load a values overlay file, or combine every *.yaml/*.yml file in a directory."""
+    if not os.path.isdir(path):
+        return _load_yaml(path)
+    combined: dict = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith((".yaml", ".yml")):
+            combined = _combine_overlays(combined, _load_yaml(os.path.join(path, name)))
+    return combined
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Replace path with data so that readers never see a partial file."""
+    file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file_handle:
+            file_handle.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_path)
+        raise
+
+
+def _build_ref(repository: str, image: str, version: str) -> str | None:
+    """Return a fully-qualified image reference, or None if any part is missing."""
+    repository = (repository or "").strip()
+    image = (image or "").strip()
+    version = (version or "").strip()
+    if not repository or not image or not version:
+        return None
+    return f"{repository}/{image}:{version}"
+
+
+def _split_ref(image_reference: str) -> tuple[str, str, str]:
+    """Split `host/namespace:tag` (optionally `@digest`) into (host, namespace, tag)."""
+    name = image_reference.split("@", 1)[0]
+    host, _, remainder = name.partition("/")
+    repository, _, tag = remainder.rpartition(":")
+    if not repository:
+        repository, tag = remainder, "latest"
+    return host, repository, tag
+
+
+def _repository_of(image_reference: str) -> str:
+    """`host/namespace` of a reference, without its tag or digest."""
+    host, namespace, _ = _split_ref(image_reference)
+    return f"{host}/{namespace}"
+
+
+class ImageEntry(NamedTuple):
+    """One image reference together with where it came from.
+
+    reference   fully-qualified image reference
+    component   image name, e.g. "driver" or "k8s-driver-manager"
+    source      values.yaml key (e.g. "driver.manager") or manifest path it was found in
+    origin      values | app-version | os-variant | fallback | discovered
+    version     the resolved tag
+    """
+    reference: str
+    component: str
+    source: str
+    origin: str
+    version: str
+
+
+def _image_entry(image_reference: str, source: str, origin: str) -> ImageEntry:
+    _, namespace, tag = _split_ref(image_reference)
+    return ImageEntry(image_reference, namespace.rsplit("/", 1)[-1], source, origin, tag)
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+_METRIC_PREFIX = "gpu_operator_image_list"
+
+
+class _Metrics:
+    """Thread-safe recorder of phase spans, registry requests and event counters.
+
+    Recording is cheap and always on; nothing is written unless --trace (JSON)
+    or --metrics-out (Prometheus textfile) is given.  Counters are keyed by name
+    and labels, e.g. count("fallbacks", namespace="nvidia/driver", reason="registry-error").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.monotonic()
+        self.started_at = time.time()
+        self.spans: list[dict] = []
+        self.requests: list[dict] = []
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._origin
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """Record the wall time of the enclosed block as a span called name."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            span = {
+                "name": name,
+                "start": round(start - self._origin, 6),
+                "duration": round(time.monotonic() - start, 6),
+                "thread": threading.current_thread().name,
+                **attributes,
+            }
+            with self._lock:
+                self.spans.append(span)
+
+    def count(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def total(self, name: str) -> float:
+        """Sum of counter name over all its labels."""
+        with self._lock:
+            return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def record_request(
+        self,
+        method: str,
+        url: str,
+        status: int | None,
+        size: int,
+        latency: float,
+        attempt: int,
+        error: str | None = None,
+    ) -> None:
+        parsed = urllib.parse.urlsplit(url)
+        request = {
+            "method": method,
+            "host": parsed.netloc,
+            "path": parsed.path + (f"?{parsed.query}" if parsed.query else ""),
+            "status": status,
+            "bytes": size,
+            "latency": round(latency, 6),
+            "attempt": attempt,
+            "start": round(time.monotonic() - latency - self._origin, 6),
+        }
+        if error:
+            request["error"] = error
+        with self._lock:
+            self.requests.append(request)
+
+    def to_json(self) -> dict:
+        with self._lock:
+            spans, requests = list(self.spans), list(self.requests)
+            counters = dict(self.counters)
+        totals: dict[str, float] = {}
+        for (name, _), value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+            "duration": round(self.elapsed(), 6),
+            "summary": {
+                "requests": len(requests),
+                "bytes": sum(request["bytes"] for request in requests),
+                **totals,
+            },
+            "spans": sorted(spans, key=lambda span: span["start"]),
+            "requests": sorted(requests, key=lambda request: request["start"]),
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the run as a node-exporter textfile collector file."""
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        def sample(name: str, labels: tuple, value: float) -> str:
+            label_text = ",".join(f'{key}="{escape(str(val))}"' for key, val in labels)
+            if label_text:
+                return f"{_METRIC_PREFIX}_{name}{{{label_text}}} {value:.15g}"
+            return f"{_METRIC_PREFIX}_{name} {value:.15g}"
+
+        metrics: dict[str, tuple[str, str, dict[tuple, float]]] = {}
+
+        def add(name: str, metric_type: str, help_text: str, labels: dict, value: float,
+                suffix: str = "") -> None:
+            samples = metrics.setdefault(name, (metric_type, help_text, {}))[2]
+            key = (suffix, tuple(sorted(labels.items())))
+            samples[key] = samples.get(key, 0) + value
+
+        add("run_duration_seconds", "gauge", "Wall time of the run.", {}, self.elapsed())
+        add("last_run_timestamp_seconds", "gauge", "Unix time the run started.", {}, self.started_at)
+        with self._lock:
+            spans, requests = list(self.spans), list(self.requests)
+            counters = dict(self.counters)
+        for span in spans:
+            add("phase_duration_seconds", "gauge", "Summed wall time per phase.",
+                {"phase": span["name"]}, span["duration"])
+        for request in requests:
+            labels = {"host": request["host"], "method": request["method"]}
+            status = str(request["status"]) if request["status"] is not None else "error"
+            add("registry_requests_total", "counter", "Registry HTTP requests by response status.",
+                {**labels, "status": status}, 1)
+            add("registry_request_duration_seconds", "summary", "Registry request latency.",
+                labels, request["latency"], "_sum")
+            add("registry_request_duration_seconds", "summary", "Registry request latency.",
+                labels, 1, "_count")
+            add("registry_response_bytes_total", "counter", "Registry response body bytes.",
+                {"host": request["host"]}, request["bytes"])
+        for (name, labels), value in counters.items():
+            add(f"{name}_total", "counter", f"Count of {name.replace('_', ' ')}.", dict(labels), value)
+
+        lines = []
+        for name, (metric_type, help_text, samples) in sorted(metrics.items()):
+            lines += [f"# HELP {_METRIC_PREFIX}_{name} {help_text}",
+                      f"# TYPE {_METRIC_PREFIX}_{name} {metric_type}"]
+            lines += [
+                sample(name + suffix, labels, value)
+                for (suffix, labels), value in sorted(samples.items(), key=lambda item: item[0][::-1])
+            ]
+        return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Registry API helpers (Docker Registry v2 / OCI Distribution spec)
+# ---------------------------------------------------------------------------
+
+class _RegistryHTTPError(RuntimeError):
+    """Raised when the registry answers with a non-retryable (or exhausted) error status."""
+
+    def __init__(self, url: str, status: int, reason: str = "", headers=None):
+        super().__init__(f"HTTP {status} {reason} for {url}".replace("  ", " "))
+        self.url = url
+        self.status = status
+        self.headers = headers if headers is not None else {}
+
+
+class _RegistryResponse:
+    """A fully-read HTTP response (the connection is already back in the pool)."""
+
+    def __init__(self, status: int, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> dict:
+        return json.loads(self.body) if self.body else {}
+
+
+class _TokenError(RuntimeError):
+    """The token realm answered without a token."""
+
+
+class _Memo:
+    """Thread-safe compute-once map.
+
+    Concurrent callers asking for the same key wait for a single computation and
+    share its result.  Failed computations are not remembered.
+    """
+
+    def __init__(self):
+        self._values: dict = {}
+        self._locks: dict = {}
+        self._guard = threading.Lock()
+
+    def get(self, key, compute):
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._values:
+                self._values[key] = compute()
+            return self._values[key]
+
+    def items(self) -> list[tuple]:
+        """(key, value) pairs computed successfully so far."""
+        with self._guard:
+            return list(self._values.items())
+
+
+class _TagCache:
+    """Cache of registry tag lists, keyed by registry host and namespace.
+
+    Tag lists fetched during this run are kept in memory, so each namespace is
+    queried at most once per process.  When cache_dir is set, entries are also
+    persisted on disk: each stores the tag-list pages exactly as they were
+    fetched, together with the ETag the registry returned for each page, so that
+    a stale entry can be revalidated with conditional requests instead of being
+    downloaded again.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | None = None,
+        ttl: float = DEFAULT_CACHE_TTL,
+        offline: bool = False,
+    ):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.offline = offline
+        self.fetched = _Memo()
+
+    def _path(self, registry_host: str, namespace: str) -> str:
+        return os.path.join(
+            self.cache_dir,
+            urllib.parse.quote(registry_host, safe=""),
+            urllib.parse.quote(namespace, safe="") + ".json",
+        )
+
+    def load(self, registry_host: str, namespace: str) -> dict | None:
+        """Return the on-disk entry for registry_host/namespace, or None."""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(registry_host, namespace)) as file_handle:
+                entry = json.load(file_handle)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not isinstance(entry.get("pages"), list):
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    def store(self, registry_host: str, namespace: str, pages: list[dict]) -> None:
+        """Atomically write the tag-list pages for registry_host/namespace."""
+        if not self.cache_dir:
+            return
+        path = self._path(registry_host, namespace)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, json.dumps({"fetched_at": time.time(), "pages": pages}).encode())
+
+
+def _tags_from_pages(pages: list[dict]) -> list[str]:
+    return [tag for page in pages for tag in page.get("tags") or []]
+
+
+# Supply-chain artefact pseudo-tags published next to the images
+_ARTIFACT_TAG = re.compile(r"\.(sbom|sig|vex)$|^sha256-")
+# A release version such as 595.58.03 or v2.5.2
+_RELEASE_VERSION = re.compile(r"^v?\d+(\.\d+)+$")
+
+
+def _version_key(version: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in re.findall(r"\d+", version))
+
+
+class _TagIndex:
+    """The tags of one repository, indexed by version prefix.
+
+    A tag is filed under every prefix that ends before one of its dashes, so
+    595.58.03-ubuntu22.04 is found under "595.58.03" and the precompiled
+    595-5.15.0-1065-nvidia-ubuntu22.04 under "595", "595-5.15.0", … .  Looking up
+    the OS variants of a version is then a dictionary access instead of a scan
+    of the whole tag list.  Supply-chain artefact tags are left out.
+    """
+
+    def __init__(self, tags: list[str]):
+        self.by_prefix: dict[str, list[str]] = {}
+        for tag in tags:
+            if _ARTIFACT_TAG.search(tag):
+                continue
+            for position, character in enumerate(tag):
+                if character == "-":
+                    self.by_prefix.setdefault(tag[:position], []).append(tag)
+
+    def variants(self, version: str) -> list[str]:
+        """Return every tag of the form <version>-<suffix>."""
+        return self.by_prefix.get(version, [])
+
+    def versions(self, branch_only: bool = False) -> list[str]:
+        """Return the indexed release versions (or bare branches), newest first."""
+        pattern = re.compile(r"^v?\d+$") if branch_only else _RELEASE_VERSION
+        return sorted((key for key in self.by_prefix if pattern.match(key)), key=_version_key,
+                      reverse=True)
+
+
+class _Manifest:
+    """Digest, media type and (when fetched with a body) raw bytes and parsed JSON of a manifest."""
+
+    def __init__(
+        self,
+        digest: str,
+        media_type: str,
+        document: dict | None = None,
+        raw: bytes | None = None,
+    ):
+        self.digest = digest
+        self.media_type = media_type
+        self.document = document
+        self.raw = raw
+
+    @property
+    def is_index(self) -> bool:
+        return self.media_type in _INDEX_MEDIA_TYPES
+
+
+def _parse_bearer_challenge(header: str) -> dict[str, str]:
+    """Parse `Bearer realm="…",service="…"` into {"realm": …, "service": …}."""
+    if not header.lower().startswith("bearer "):
+        return {}
+    return {
+        key.lower(): value
+        for key, value in re.findall(r'(\w+)="([^"]*)"', header[len("bearer "):])
+    }
+
+
+class _RegistryClient:
+    """Small, thread-safe Docker Registry v2 client.
+
+    - Keeps idle keep-alive connections in a per-host pool instead of opening a
+      new TCP+TLS connection for every request.
+    - Discovers each host's token realm from its WWW-Authenticate challenge and
+      caches anonymous pull tokens until shortly before they expire.  Namespaces
+      registered with add_scope_hints() are requested together in a single
+      multi-scope token request the first time any of them needs a token.
+    - Retries 429/5xx responses and connection errors with exponential backoff,
+      honouring a numeric Retry-After header.
+
+    Hosts listed in plain_http_hosts are spoken to over plain HTTP, which allows
+    pointing the script at a local stand-in registry.  Requests go through the
+    proxies given (a urllib.request.getproxies() style mapping; by default the
+    HTTP_PROXY / HTTPS_PROXY / NO_PROXY environment), HTTPS ones in a CONNECT
+    tunnel.  Every request attempt, retry, token fetch and cache hit is recorded
+    in metrics.
+    """
+
+    def __init__(
+        self,
+        tag_cache: _TagCache | None = None,
+        timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_RETRY_BACKOFF,
+        plain_http_hosts: tuple[str, ...] | list[str] = (),
+        metrics: _Metrics | None = None,
+        proxies: dict[str, str] | None = None,
+    ):
+        self.tag_cache = tag_cache if tag_cache is not None else _TagCache()
+        self.metrics = metrics if metrics is not None else _Metrics()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.plain_http_hosts = set(plain_http_hosts)
+        self.proxies = urllib.request.getproxies() if proxies is None else dict(proxies)
+        self._system_proxies = proxies is None
+        self._proxy_routes = _Memo()
+        self._pool: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._pool_lock = threading.Lock()
+        self._tokens: dict[tuple[str, str], tuple[str, float]] = {}
+        self._scope_hints: dict[str, set[str]] = {}
+        self._token_locks: dict[str, threading.Lock] = {}
+        self._token_lock = threading.Lock()
+        self._auth_challenges = _Memo()
+        self._manifests = _Memo()
+        self._manifests_by_digest: dict[tuple[str, str, str], _Manifest] = {}
+        self._tag_indexes = _Memo()
+        self._platforms = _Memo()
+
+    def __enter__(self) -> "_RegistryClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._pool_lock:
+            connections = [c for idle in self._pool.values() for c in idle]
+            self._pool.clear()
+        for connection in connections:
+            connection.close()
+
+    def base_url(self, registry_host: str) -> str:
+        scheme = "http" if registry_host in self.plain_http_hosts else "https"
+        return f"{scheme}://{registry_host}"
+
+    # -- connection pool ----------------------------------------------------
+
+    def _proxy_route(self, scheme: str, netloc: str) -> tuple[str, str, dict[str, str]] | None:
+        """Return (proxy scheme, proxy netloc, proxy headers) for scheme://netloc.
+
+        Returns None when there is no proxy for scheme or no_proxy covers netloc.
+        """
+        def route() -> tuple[str, str, dict[str, str]] | None:
+            proxy = self.proxies.get(scheme)
+            if not proxy:
+                return None
+            if (urllib.request.proxy_bypass(netloc) if self._system_proxies
+                    else urllib.request.proxy_bypass_environment(netloc, self.proxies)):
+                return None
+            parsed = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            host = f"[{parsed.hostname}]" if ":" in (parsed.hostname or "") else parsed.hostname
+            port = parsed.port or (443 if parsed.scheme == "https" else 80)
+            headers = {}
+            if parsed.username:
+                credentials = (f"{urllib.parse.unquote(parsed.username)}:"
+                               f"{urllib.parse.unquote(parsed.password or '')}")
+                headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode()
+            return parsed.scheme, f"{host}:{port}", headers
+
+        return self._proxy_routes.get((scheme, netloc), route)
+
+    def _acquire(self, scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused) for scheme://netloc, through its proxy if it has one."""
+        with self._pool_lock:
+            idle = self._pool.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        route = self._proxy_route(scheme, netloc)
+        if route is None:
+            if scheme == "http":
+                return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout), False
+        proxy_scheme, proxy_netloc, proxy_headers = route
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(proxy_netloc, timeout=self.timeout)
+            connection.set_tunnel(netloc, headers=proxy_headers)
+            return connection, False
+        if proxy_scheme == "https":
+            return http.client.HTTPSConnection(proxy_netloc, timeout=self.timeout), False
+        return http.client.HTTPConnection(proxy_netloc, timeout=self.timeout), False
+
+    def _release(self, scheme: str, netloc: str, connection: http.client.HTTPConnection) -> None:
+        with self._pool_lock:
+            self._pool.setdefault((scheme, netloc), []).append(connection)
+
+    def _sleep_before_retry(self, attempt: int, retry_after: str | None) -> None:
+        delay = self.backoff * (2 ** attempt)
+        if retry_after and retry_after.strip().isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(delay)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        max_redirects: int = 5,
+        sink=None,
+    ) -> _RegistryResponse:
+        """Issue a request, retrying 429/5xx and connection errors.
+
+        Redirects are followed (dropping Authorization when the host changes).
+        Returns responses with status < 400 (including 304); raises
+        _RegistryHTTPError for anything else.
+
+        When sink is given, a 200/206 response body is not buffered: sink(response)
+        is called to consume it and the returned body is empty.  Errors raised
+        while streaming are not retried, since sink may already have written data.
+        """
+        headers = dict(headers or {})
+        attempt = 0
+        while True:
+            parsed = urllib.parse.urlsplit(url)
+            path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+            request_headers = headers
+            route = self._proxy_route(parsed.scheme, parsed.netloc)
+            if route is not None and parsed.scheme == "http":
+                # Plain HTTP goes to the proxy itself, with the absolute URL
+                path = f"http://{parsed.netloc}{path}"
+                request_headers = {**headers, **route[2]}
+            connection, reused = self._acquire(parsed.scheme, parsed.netloc)
+            streamed = False
+            started = time.monotonic()
+            try:
+                connection.request(method, path, headers=request_headers)
+                raw_response = connection.getresponse()
+                if sink is not None and raw_response.status in (200, 206):
+                    streamed = True
+                    sink(raw_response)
+                    body = b""
+                else:
+                    body = raw_response.read()
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                self.metrics.record_request(
+                    method, url, None, 0, time.monotonic() - started, attempt, type(exc).__name__
+                )
+                if streamed:
+                    raise
+                if reused:
+                    continue  # the server closed an idle keep-alive connection; reconnect
+                if attempt >= self.retries:
+                    raise
+                self.metrics.count("retries", host=parsed.netloc, reason="connection-error")
+                self._sleep_before_retry(attempt, None)
+                attempt += 1
+                continue
+
+            if raw_response.will_close:
+                connection.close()
+            else:
+                self._release(parsed.scheme, parsed.netloc, connection)
+
+            status = raw_response.status
+            size = len(body) if not streamed else int(raw_response.headers.get("Content-Length") or 0)
+            self.metrics.record_request(method, url, status, size, time.monotonic() - started, attempt)
+            if status in _RETRYABLE_STATUSES and attempt < self.retries:
+                self.metrics.count("retries", host=parsed.netloc, reason=str(status))
+                self._sleep_before_retry(attempt, raw_response.headers.get("Retry-After"))
+                attempt += 1
+                continue
+            if status in (301, 302, 303, 307, 308) and raw_response.headers.get("Location"):
+                if max_redirects <= 0:
+                    raise _RegistryHTTPError(url, status, "too many redirects")
+                max_redirects -= 1
+                location = urllib.parse.urljoin(url, raw_response.headers["Location"])
+                if urllib.parse.urlsplit(location).netloc != parsed.netloc:
+                    headers.pop("Authorization", None)
+                url = location
+                continue
+            if status >= 400:
+                raise _RegistryHTTPError(url, status, raw_response.reason, raw_response.headers)
+            return _RegistryResponse(status, raw_response.headers, body)
+
+    # -- tokens -------------------------------------------------------------
+
+    def add_scope_hints(self, registry_host: str, namespaces) -> None:
+        """Register namespaces to include in the next token request for registry_host."""
+        with self._token_lock:
+            self._scope_hints.setdefault(registry_host, set()).update(namespaces)
+
+    def _cached_token(self, registry_host: str, namespace: str) -> tuple[str | None, float] | None:
+        cached = self._tokens.get((registry_host, namespace))
+        if cached and cached[1] > time.monotonic():
+            return cached
+        return None
+
+    def _auth_challenge(self, registry_host: str) -> dict[str, str] | None:
+        """Return the Bearer challenge parameters (realm, service) for registry_host.
+
+        Returns None when the registry allows anonymous access without a token.
+        nvcr.io advertises:
+            WWW-Authenticate: Bearer realm="https://nvcr.io/proxy_auth",scope=""
+        and is assumed if the /v2/ endpoint gives no usable challenge.
+        """
+        def discover() -> dict[str, str] | None:
+            try:
+                self.request("GET", f"{self.base_url(registry_host)}/v2/")
+                return None
+            except _RegistryHTTPError as exc:
+                challenge = _parse_bearer_challenge(exc.headers.get("WWW-Authenticate", ""))
+                if exc.status == 401 and challenge.get("realm"):
+                    return challenge
+            except (OSError, http.client.HTTPException):
+                pass
+            return {"realm": f"{self.base_url(registry_host)}/proxy_auth"}
+
+        return self._auth_challenges.get(registry_host, discover)
+
+    def _fetch_token(self, registry_host: str, namespaces: list[str]) -> None:
+        """Obtain one anonymous Bearer token covering every namespace in namespaces.
+
+        A GET to the realm with the desired scope(s) returns {"token": "…"}.
+        """
+        challenge = self._auth_challenge(registry_host)
+        self.metrics.count("token_fetches", host=registry_host)
+        if challenge is None:
+            token, expires_in = None, DEFAULT_TOKEN_LIFETIME
+        else:
+            params = [("scope", f"repository:{namespace}:pull") for namespace in namespaces]
+            if challenge.get("service"):
+                params.insert(0, ("service", challenge["service"]))
+            token_url = f"{challenge['realm']}?{urllib.parse.urlencode(params)}"
+            data = self.request("GET", token_url, {"Accept": "application/json"}).json()
+            token = data.get("token") or data.get("access_token")
+            if not token:
+                raise _TokenError(f"No token returned from {token_url}: {data}")
+            expires_in = data.get("expires_in") or DEFAULT_TOKEN_LIFETIME
+        expiry = time.monotonic() + max(expires_in - TOKEN_EXPIRY_MARGIN, 0)
+        with self._token_lock:
+            for namespace in namespaces:
+                self._tokens[(registry_host, namespace)] = (token, expiry)
+
+    def token(self, registry_host: str, namespace: str) -> str | None:
+        """Return a valid pull token for registry_host/namespace, fetching one if needed.
+
+        Returns None for registries that do not require a token.
+        """
+        with self._token_lock:
+            host_lock = self._token_locks.setdefault(registry_host, threading.Lock())
+        with host_lock:
+            cached = self._cached_token(registry_host, namespace)
+            if cached:
+                self.metrics.count("cache_hits", kind="token")
+                return cached[0]
+            hinted = sorted(
+                hint for hint in self._scope_hints.get(registry_host, ())
+                if hint != namespace and not self._cached_token(registry_host, hint)
+            )
+            try:
+                self._fetch_token(registry_host, [namespace, *hinted])
+            except Exception:  # noqa: BLE001
+                if not hinted:
+                    raise
+                # The realm may not support multi-scope requests; ask for one scope.
+                self._fetch_token(registry_host, [namespace])
+            return self._tokens[(registry_host, namespace)][0]
+
+    def invalidate_token(self, registry_host: str, namespace: str) -> None:
+        with self._token_lock:
+            self._tokens.pop((registry_host, namespace), None)
+
+    def authorized_request(
+        self,
+        method: str,
+        registry_host: str,
+        namespace: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        sink=None,
+    ) -> _RegistryResponse:
+        """Issue a request with a pull token for namespace, renewing it once on 401."""
+        for renewed in (False, True):
+            request_headers = dict(headers or {})
+            token = self.token(registry_host, namespace)
+            if token:
+                request_headers["Authorization"] = f"Bearer {token}"
+            try:
+                return self.request(method, url, request_headers, sink=sink)
+            except _RegistryHTTPError as exc:
+                if exc.status != 401 or renewed:
+                    raise
+                self.invalidate_token(registry_host, namespace)
+        raise AssertionError("unreachable")
+
+    # -- tags ---------------------------------------------------------------
+
+    def fetch_all_tags(self, registry_host: str, namespace: str) -> list[str]:
+        """Return every tag for registry_host/namespace using the v2 tags/list API.
+
+        Handles RFC 5988-style Link header pagination automatically.
+
+        Each namespace is fetched at most once per run, and a fresh on-disk
+        entry is returned without contacting the registry.  A stale entry is
+        revalidated page by page: pages whose ETag still matches
+        (304 Not Modified) are reused from the cache.
+        """
+        fetched = []
+
+        def fetch() -> list[str]:
+            fetched.append(True)
+            with self.metrics.span("tags", namespace=f"{registry_host}/{namespace}"):
+                return self._fetch_tags_through_cache(registry_host, namespace)
+
+        tags = self.tag_cache.fetched.get((registry_host, namespace), fetch)
+        if not fetched:
+            self.metrics.count("cache_hits", kind="tags-memory")
+        return tags
+
+    def tag_index(self, registry_host: str, namespace: str) -> "_TagIndex":
+        """Return the tags of registry_host/namespace indexed by version prefix (built once)."""
+        return self._tag_indexes.get(
+            (registry_host, namespace),
+            lambda: _TagIndex(self.fetch_all_tags(registry_host, namespace)),
+        )
+
+    def _fetch_tags_through_cache(self, registry_host: str, namespace: str) -> list[str]:
+        tag_cache = self.tag_cache
+        cached_entry = tag_cache.load(registry_host, namespace)
+        if tag_cache.offline:
+            if cached_entry is None:
+                raise RuntimeError(f"offline and no cached tags for {registry_host}/{namespace}")
+            self.metrics.count("cache_hits", kind="tags-offline")
+            return _tags_from_pages(cached_entry["pages"])
+        if cached_entry and tag_cache.is_fresh(cached_entry):
+            self.metrics.count("cache_hits", kind="tags-fresh")
+            return _tags_from_pages(cached_entry["pages"])
+
+        cached_pages = {
+            page["url"]: page
+            for page in (cached_entry or {}).get("pages", [])
+            if page.get("etag")
+        }
+
+        base_url = self.base_url(registry_host)
+        pages: list[dict] = []
+        tags_url = f"{base_url}/v2/{namespace}/tags/list?n=1000"
+
+        while tags_url:
+            headers = {"Accept": "application/json"}
+            cached_page = cached_pages.get(tags_url)
+            if cached_page:
+                headers["If-None-Match"] = cached_page["etag"]
+            response = self.authorized_request("GET", registry_host, namespace, tags_url, headers)
+            self.metrics.count("tag_pages", namespace=f"{registry_host}/{namespace}")
+            if response.status == 304 and cached_page:
+                self.metrics.count("cache_hits", kind="tag-page-not-modified")
+                page = cached_page
+                if "Link" in response.headers:
+                    # The page is unchanged, but tags added after it may have added a next page
+                    page = {**cached_page, "next": _parse_link_next(response.headers["Link"])}
+            else:
+                page = {
+                    "url": tags_url,
+                    "etag": response.headers.get("ETag"),
+                    "tags": response.json().get("tags") or [],
+                    # Follow Link: <url>; rel="next" pagination
+                    "next": _parse_link_next(response.headers.get("Link", "")),
+                }
+            pages.append(page)
+
+            next_url = page["next"]
+            # Link URLs from nvcr.io are relative paths; make them absolute
+            if next_url and next_url.startswith("/"):
+                next_url = f"{base_url}{next_url}"
+            tags_url = next_url
+
+        tag_cache.store(registry_host, namespace, pages)
+        return _tags_from_pages(pages)
+
+    # -- manifests ----------------------------------------------------------
+
+    def manifest(
+        self,
+        registry_host: str,
+        namespace: str,
+        reference: str,
+        with_body: bool = False,
+    ) -> "_Manifest":
+        """Return the manifest for registry_host/namespace:reference.
+
+        Without with_body a HEAD request is enough to learn the digest and media
+        type.  Results are memoized, so references shared by several components
+        are resolved only once per run, and a digest reference is answered from
+        any manifest already fetched by tag that has that digest.
+        """
+        if reference.startswith("sha256:"):
+            known = self._manifests_by_digest.get((registry_host, namespace, reference))
+            if known is not None and (known.raw is not None or not with_body):
+                self.metrics.count("cache_hits", kind="manifest-memory")
+                return known
+
+        fetched = []
+
+        def fetch() -> _Manifest:
+            fetched.append(True)
+            url = f"{self.base_url(registry_host)}/v2/{namespace}/manifests/{reference}"
+            method = "GET" if with_body else "HEAD"
+            response = self.authorized_request(
+                method, registry_host, namespace, url, {"Accept": _MANIFEST_ACCEPT}
+            )
+            digest = response.headers.get("Docker-Content-Digest")
+            if not digest and method == "HEAD":
+                return self.manifest(registry_host, namespace, reference, with_body=True)
+            if not digest:
+                digest = f"sha256:{hashlib.sha256(response.body).hexdigest()}"
+            media_type = (response.headers.get("Content-Type") or "").split(";")[0].strip()
+            document = json.loads(response.body) if with_body and response.body else None
+            if document:
+                media_type = document.get("mediaType") or media_type
+            manifest = _Manifest(digest, media_type, document, response.body if with_body else None)
+            digest_key = (registry_host, namespace, digest)
+            if with_body or digest_key not in self._manifests_by_digest:
+                self._manifests_by_digest[digest_key] = manifest
+            return manifest
+
+        manifest = self._manifests.get((registry_host, namespace, reference, with_body), fetch)
+        if not fetched:
+            self.metrics.count("cache_hits", kind="manifest-memory")
+        return manifest
+
+    def platforms(self, registry_host: str, namespace: str, reference: str) -> list[str]:
+        """Return the os/architecture[/variant] platforms an image reference provides.
+
+        Read from the manifest list / OCI index, or from the image config of a
+        single-platform image.  Memoized, so a tag shared by several components
+        (e.g. the device-plugin image reused by GFD) is inspected once.
+        """
+        def inspect() -> list[str]:
+            manifest = self.manifest(registry_host, namespace, reference, with_body=True)
+            document = manifest.document or {}
+            if manifest.is_index:
+                return [platform for platform, _ in _platform_digests(document)]
+            config_digest = (document.get("config") or {}).get("digest")
+            if not config_digest:
+                return []
+            url = f"{self.base_url(registry_host)}/v2/{namespace}/blobs/{config_digest}"
+            config = self.authorized_request("GET", registry_host, namespace, url).json()
+            platform = _platform_name(config)
+            return [platform] if platform else []
+
+        return self._platforms.get((registry_host, namespace, reference), inspect)
+
+    def forget_registry_state(self) -> None:
+        """Drop memoized tag lists and manifests so later lookups see registry changes.
+
+        Pull tokens and pooled connections are kept.
+        """
+        self.tag_cache.fetched = _Memo()
+        self._manifests = _Memo()
+        self._manifests_by_digest = {}
+        self._tag_indexes = _Memo()
+        self._platforms = _Memo()
+
+
+def _parse_link_next(link_header: str) -> str | None:
+    """Extract the URL from a `Link: <url>; rel="next"` header, if present."""
+    for part in link_header.split(","):
+        part = part.strip()
+        match = re.match(r'<([^>]+)>.*rel=["\']?next["\']?', part)
+        if match:
+            return match.group(1)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# OS-variant filtering
+# ---------------------------------------------------------------------------
+
+# An OS token in a tag suffix, e.g. ubuntu22.04, rhel9.4, rhcos4.18, rocky9
+_OS_TOKEN = re.compile(r"^[a-z]+\d+(?:\.\d+)*$")
+_ARCH_TOKENS = frozenset({"amd64", "arm64"})
+
+# Node labels set by NFD (see internal/nodeinfo/attributes.go)
+_NFD_OS_RELEASE_ID_LABEL = "feature.node.kubernetes.io/system-os_release.ID"
+_NFD_OS_VERSION_ID_LABEL = "feature.node.kubernetes.io/system-os_release.VERSION_ID"
+_NFD_KERNEL_LABEL = "feature.node.kubernetes.io/kernel-version.full"
+_GPU_PRESENT_LABEL = "nvidia.com/gpu.present"
+
+
+def _split_os_suffix(suffix: str) -> tuple[str | None, str | None]:
+    """Split the part of a tag after ``<version>-`` into (kernel, os).
+
+    "ubuntu22.04"                    -> (None, "ubuntu22.04")
+    "5.15.0-1065-nvidia-ubuntu22.04" -> ("5.15.0-1065-nvidia", "ubuntu22.04")  (precompiled)
+    """
+    tokens = suffix.split("-")
+    for index in range(len(tokens) - 1, -1, -1):
+        if _OS_TOKEN.match(tokens[index]) and tokens[index] not in _ARCH_TOKENS:
+            return ("-".join(tokens[:index]) or None), tokens[index]
+    return None, None
+
+
+def _os_tag(os_release: str, os_version: str) -> str:
+    """Mirror getOSTag in internal/state/nodepool.go.
+
+    Rocky Linux and RHEL 10+ drop the minor version from the image tag.
+    """
+    os_major_version = os_version.split(".")[0]
+    if os_release == "rocky":
+        return f"{os_release}{os_major_version}"
+    if os_release == "rhel" and os_major_version.isdigit() and int(os_major_version) >= 10:
+        return f"{os_release}{os_major_version}"
+    return f"{os_release}{os_version}"
+
+
+def _node_os_tag(node: dict) -> str | None:
+    """Return the driver OS tag for a node from its NFD labels or nodeInfo.osImage."""
+    labels = (node.get("metadata") or {}).get("labels") or {}
+    if labels.get(_NFD_OS_RELEASE_ID_LABEL) and labels.get(_NFD_OS_VERSION_ID_LABEL):
+        return _os_tag(labels[_NFD_OS_RELEASE_ID_LABEL], labels[_NFD_OS_VERSION_ID_LABEL])
+
+    os_image = ((node.get("status") or {}).get("nodeInfo") or {}).get("osImage") or ""
+    # e.g. "Red Hat Enterprise Linux CoreOS 415.92.202402201450-0 (Plow)" -> rhcos4.15
+    match = re.search(r"CoreOS (\d)(\d+)\.", os_image)
+    if match:
+        return f"rhcos{match.group(1)}.{match.group(2)}"
+    # e.g. "Red Hat Enterprise Linux 9.4 (Plow)" -> rhel9.4
+    match = re.search(r"Red Hat Enterprise Linux (\d+(?:\.\d+)?)", os_image)
+    if match:
+        return _os_tag("rhel", match.group(1))
+    # e.g. "Ubuntu 22.04.4 LTS" -> ubuntu22.04, "Rocky Linux 9.3 (Blue Onyx)" -> rocky9
+    match = re.match(r"([A-Za-z]+)[A-Za-z ]*?(\d+\.\d+)", os_image)
+    if match:
+        return _os_tag(match.group(1).lower(), match.group(2))
+    return None
+
+
+def _node_kernel(node: dict) -> str | None:
+    labels = (node.get("metadata") or {}).get("labels") or {}
+    node_info = (node.get("status") or {}).get("nodeInfo") or {}
+    return labels.get(_NFD_KERNEL_LABEL) or node_info.get("kernelVersion") or None
+
+
+class _OSFilter:
+    """Selects which OS-variant tags to keep.
+
+    include/exclude are fnmatch patterns on the OS token of a tag (e.g. "ubuntu*",
+    "rhel9.4").  kernels, when set, restricts precompiled (kernel-specific) tags
+    to the listed kernel patterns; tags without a kernel part are unaffected.
+    """
+
+    def __init__(self, include=(), exclude=(), kernels=()):
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.kernels = list(kernels)
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude or self.kernels)
+
+    def matches(self, suffix: str) -> bool:
+        kernel, os_token = _split_os_suffix(suffix)
+        if os_token is None:
+            # Not an OS-variant tag we understand; only an explicit include can drop it.
+            return not self.include
+        if self.include and not any(fnmatch.fnmatchcase(os_token, p) for p in self.include):
+            return False
+        if any(fnmatch.fnmatchcase(os_token, p) for p in self.exclude):
+            return False
+        if kernel and self.kernels and not any(fnmatch.fnmatchcase(kernel, p) for p in self.kernels):
+            return False
+        return True
+
+    @classmethod
+    def from_nodes(cls, path: str, include=(), exclude=(), kernels=()) -> "_OSFilter":
+        """Build a filter from `kubectl get nodes -o json` output (or a single node).
+
+        Only nodes labelled nvidia.com/gpu.present=true are considered when any
+        node carries that label.
+        """
+        with open(path) as file_handle:
+            document = json.load(file_handle)
+        nodes = document.get("items", [document]) if isinstance(document, dict) else document
+        gpu_nodes = [
+            node for node in nodes
+            if ((node.get("metadata") or {}).get("labels") or {}).get(_GPU_PRESENT_LABEL) == "true"
+        ]
+        node_os_tags = {tag for tag in map(_node_os_tag, gpu_nodes or nodes) if tag}
+        node_kernels = {kernel for kernel in map(_node_kernel, gpu_nodes or nodes) if kernel}
+        if not node_os_tags:
+            raise ValueError(f"could not determine any node OS from {path}")
+        return cls([*include, *sorted(node_os_tags)], exclude, [*kernels, *sorted(node_kernels)])
+
+
+def _os_variant_tags(
+    registry_host: str,
+    namespace: str,
+    version: str,
+    fallback_ref: str,
+    skip_registry: bool,
+    client: _RegistryClient | None = None,
+    os_filter: _OSFilter | None = None,
+) -> list[str]:
+    """Return all OS-variant image refs for a given component version.
+
+    Queries the registry for tags matching ``<version>-<os-suffix>``.
+    Supply-chain artefact tags (*.sbom, *.sig, *.vex, sha256-*) are excluded,
+    and os_filter, if given, drops unwanted OS / kernel variants.
+
+    Falls back to [fallback_ref] when:
+    - skip_registry is True, or
+    - the registry is unreachable / returns no matching tags.
+    """
+    if skip_registry:
+        return [fallback_ref] if fallback_ref else []
+
+    try:
+        if client is None:
+            with _RegistryClient() as client:
+                tag_index = client.tag_index(registry_host, namespace)
+        else:
+            tag_index = client.tag_index(registry_host, namespace)
+    except Exception as exc:  # noqa: BLE001
+        print(f"  Warning: registry query for {registry_host}/{namespace} failed ({exc}); "
+              f"{'using fallback tag' if fallback_ref else 'skipping'}.",
+              file=sys.stderr)
+        if client is not None:
+            if fallback_ref:
+                client.metrics.count("fallbacks", namespace=f"{registry_host}/{namespace}",
+                                     reason="registry-error")
+            client.metrics.count("lookup_failures", kind="tags")
+        return [fallback_ref] if fallback_ref else []
+
+    prefix = f"{version}-"
+    matched = [f"{registry_host}/{namespace}:{tag}" for tag in tag_index.variants(version)]
+
+    if not matched:
+        print(f"  Warning: no tags found matching {version}-* in "
+              f"{registry_host}/{namespace}; {'using fallback tag' if fallback_ref else 'skipping'}.",
+              file=sys.stderr)
+        if fallback_ref:
+            client.metrics.count("fallbacks", namespace=f"{registry_host}/{namespace}",
+                                 reason="no-matching-tags")
+        return [fallback_ref] if fallback_ref else []
+
+    if os_filter:
+        matched = [ref for ref in matched if os_filter.matches(ref.rsplit(":", 1)[1][len(prefix):])]
+        if not matched:
+            print(f"  Warning: no {version}-* tags in {registry_host}/{namespace} "
+                  "match the OS filter; skipping.",
+                  file=sys.stderr)
+            return []
+
+    return sorted(matched)
+
+
+def _resolve_os_variants(
+    lookups: list[tuple[str, str, str, str]],
+    skip_registry: bool,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+    client: _RegistryClient | None = None,
+    os_filter: _OSFilter | None = None,
+) -> list[list[str]]:
+    """Run _os_variant_tags for every (registry_host, namespace, version, fallback_ref).
+
+    Lookups are independent of each other (each walks its own tag pages), so they
+    are issued concurrently on a bounded thread pool sharing one registry client.
+    Results are returned in the same order as ``lookups``.
+    """
+    if not lookups:
+        return []
+    if skip_registry:
+        return [_os_variant_tags(*lookup, skip_registry) for lookup in lookups]
+
+    if client is None:
+        with _RegistryClient() as client:
+            return _resolve_os_variants(lookups, skip_registry, max_workers, client, os_filter)
+
+    # Let the first token request for each host cover every namespace we need
+    for registry_host, namespace, _, _ in lookups:
+        client.add_scope_hints(registry_host, [namespace])
+
+    if max_workers <= 1 or len(lookups) == 1:
+        return [_os_variant_tags(*lookup, skip_registry, client, os_filter) for lookup in lookups]
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(max_workers, len(lookups))
+    ) as executor:
+        return list(executor.map(
+            lambda lookup: _os_variant_tags(*lookup, skip_registry, client, os_filter), lookups
+        ))
+
+
+# ---------------------------------------------------------------------------
+# Digest resolution
+# ---------------------------------------------------------------------------
+
+def _platform_name(platform: dict) -> str | None:
+    """Return "os/architecture[/variant]" for an index platform or image config, or None."""
+    os_name = platform.get("os", "unknown")
+    architecture = platform.get("architecture", "unknown")
+    if os_name == "unknown" or architecture == "unknown":
+        return None
+    if platform.get("variant"):
+        architecture = f"{architecture}/{platform['variant']}"
+    return f"{os_name}/{architecture}"
+
+
+def _platform_digests(index: dict) -> list[tuple[str, str]]:
+    """Return (platform, digest) for every runnable image in a manifest list / OCI index.
+
+    Attestation manifests (platform unknown/unknown) are skipped.
+    """
+    platform_digests = []
+    for entry in index.get("manifests") or []:
+        platform = _platform_name(entry.get("platform") or {})
+        if platform:
+            platform_digests.append((platform, entry["digest"]))
+    return platform_digests
+
+
+def _normalize_platform(value: str) -> str:
+    """Accept "arm64" as shorthand for "linux/arm64"."""
+    value = value.strip().lower()
+    return value if "/" in value else f"linux/{value}"
+
+
+def _platform_matches(available: str, requested: str) -> bool:
+    """linux/arm64 matches linux/arm64 and any of its variants (linux/arm64/v8)."""
+    return available == requested or available.startswith(f"{requested}/")
+
+
+def _pin_digests(
+    images: list[str],
+    client: _RegistryClient,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+    expand_platforms: bool = False,
+    platforms: list[str] | None = None,
+) -> dict[str, list[str]]:
+    """Map every image to its content-addressed `repo:tag@sha256:…` reference(s).
+
+    Digests are read from the Docker-Content-Digest header of concurrent manifest
+    HEAD requests.  With expand_platforms, multi-arch indexes are fetched and
+    replaced by one reference per platform manifest (only the requested
+    platforms, if given).  References that cannot be resolved are kept as plain
+    tags with a warning.
+    """
+    def pin(image_reference: str) -> list[str]:
+        registry_host, namespace, tag = _split_ref(image_reference)
+        try:
+            manifest = client.manifest(registry_host, namespace, tag, with_body=expand_platforms)
+        except Exception as exc:  # noqa: BLE001
+            print(f"  Warning: could not resolve digest for {image_reference} ({exc}); "
+                  "keeping the tag reference.",
+                  file=sys.stderr)
+            client.metrics.count("lookup_failures", kind="digest")
+            return [image_reference]
+        if expand_platforms and manifest.is_index:
+            platform_digests = [
+                (platform, digest)
+                for platform, digest in _platform_digests(manifest.document or {})
+                if not platforms or any(_platform_matches(platform, p) for p in platforms)
+            ]
+            if platform_digests:
+                return [f"{image_reference}@{digest}" for _, digest in platform_digests]
+        return [f"{image_reference}@{manifest.digest}"]
+
+    for image_reference in images:
+        registry_host, namespace, _ = _split_ref(image_reference)
+        client.add_scope_hints(registry_host, [namespace])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return dict(zip(images, executor.map(pin, images)))
+
+
+# ---------------------------------------------------------------------------
+# Reference verification
+# ---------------------------------------------------------------------------
+
+def _verify_references(
+    images: list[str],
+    client: _RegistryClient,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+) -> dict[str, str]:
+    """Check that every image exists, with concurrent manifest HEAD requests.
+
+    Returns {image: result} where result is "ok", "missing" (404),
+    "unauthorized" (401/403, or a token realm that issued no token),
+    "unreachable", "HTTP <status>" or "error (<exception type>)".  Tokens are
+    shared across the pool and manifests already resolved this run (e.g. by
+    --resolve-digests) are not requested again.
+    """
+    def verify(image_reference: str) -> str:
+        registry_host, namespace, tag = _split_ref(image_reference)
+        _, _, digest = image_reference.partition("@")
+        try:
+            client.manifest(registry_host, namespace, digest or tag)
+        except _RegistryHTTPError as exc:
+            if exc.status == 404:
+                return "missing"
+            if exc.status in (401, 403):
+                return "unauthorized"
+            return f"HTTP {exc.status}"
+        except (OSError, http.client.HTTPException):
+            return "unreachable"
+        except _TokenError:
+            return "unauthorized"
+        except Exception as exc:  # noqa: BLE001
+            return f"error ({type(exc).__name__})"
+        return "ok"
+
+    for image_reference in images:
+        registry_host, namespace, _ = _split_ref(image_reference)
+        client.add_scope_hints(registry_host, [namespace])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = dict(zip(images, executor.map(verify, images)))
+    for result in results.values():
+        client.metrics.count("verified_references", result=result)
+    return results
+
+
+def _report_verification(results: dict[str, str]) -> bool:
+    """Print failed references to stderr; return True when every reference exists."""
+    failed = {image: result for image, result in sorted(results.items()) if result != "ok"}
+    if not failed:
+        print(f"Verified {len(results)} references.", file=sys.stderr)
+        return True
+    print(f"Error: {len(failed)} of {len(results)} references failed verification:",
+          file=sys.stderr)
+    width = max(len(result) for result in failed.values())
+    for image_reference, result in failed.items():
+        print(f"  {result:<{width}}  {image_reference}", file=sys.stderr)
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Per-platform availability
+# ---------------------------------------------------------------------------
+
+def _reference_platforms(
+    images: list[str],
+    client: _RegistryClient,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+    warn: bool = True,
+) -> dict[str, list[str] | None]:
+    """Map every image to the platforms it provides (None if it could not be inspected)."""
+    def inspect(image_reference: str) -> list[str] | None:
+        registry_host, namespace, tag = _split_ref(image_reference)
+        _, _, digest = image_reference.partition("@")
+        try:
+            return client.platforms(registry_host, namespace, digest or tag)
+        except Exception as exc:  # noqa: BLE001
+            client.metrics.count("lookup_failures", kind="platforms")
+            if not warn:
+                return None
+            print(f"  Warning: could not inspect platforms of {image_reference} ({exc}); "
+                  "keeping it.",
+                  file=sys.stderr)
+            return None
+
+    for image_reference in images:
+        registry_host, namespace, _ = _split_ref(image_reference)
+        client.add_scope_hints(registry_host, [namespace])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return dict(zip(images, executor.map(inspect, images)))
+
+
+def _supported_platforms(available: list[str] | None, requested: list[str]) -> list[str] | None:
+    """Return the requested platforms found in available (None when unknown)."""
+    if available is None:
+        return None
+    return [p for p in requested if any(_platform_matches(a, p) for a in available)]
+
+
+def _filter_platforms(
+    entries: list[ImageEntry],
+    client: _RegistryClient,
+    requested: list[str],
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+) -> list[ImageEntry]:
+    """Drop images that provide none of the requested platforms; flag partial ones."""
+    available = _reference_platforms(sorted({entry.reference for entry in entries}), client,
+                                     max_workers)
+    dropped = set()
+    for image_reference, platforms in available.items():
+        supported = _supported_platforms(platforms, requested)
+        if supported is None or len(supported) == len(requested):
+            continue
+        missing = ", ".join(p for p in requested if p not in supported)
+        client.metrics.count("missing_platforms", amount=len(requested) - len(supported))
+        if supported:
+            print(f"  Warning: {image_reference} is not available for {missing}.",
+                  file=sys.stderr)
+        else:
+            print(f"  Warning: {image_reference} is not available for {missing} "
+                  f"(only {', '.join(platforms) or 'no runnable platform'}); dropping it.",
+                  file=sys.stderr)
+            dropped.add(image_reference)
+    return [entry for entry in entries if entry.reference not in dropped]
+
+
+def _platform_annotations(
+    entries: list[ImageEntry],
+    client: _RegistryClient,
+    requested: list[str],
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+) -> dict[str, list[str] | None]:
+    """Map every image to the requested platforms it provides (memoized lookups)."""
+    available = _reference_platforms(
+        sorted({entry.reference for entry in entries}), client, max_workers, warn=False
+    )
+    return {
+        image_reference: _supported_platforms(platforms, requested)
+        for image_reference, platforms in available.items()
+    }
+
+
+# ---------------------------------------------------------------------------
+# GPU Operator component image extraction
+# ---------------------------------------------------------------------------
+
+class _Component(NamedTuple):
+    """One image block in the GPU Operator values.yaml.
+
+    values_path     dotted path of the block holding repository/image/version
+    os_variants     the tag carries an OS suffix (<version>-<os>); expand it via the registry
+    app_version     an unset version defaults to --gpu-operator-version / Chart.appVersion
+    """
+    values_path: str
+    os_variants: bool = False
+    app_version: bool = False
+
+
+# Every image block in values.yaml that the GPU Operator may deploy.  Blocks
+# whose repository or version is empty (e.g. the user-supplied vGPU Manager
+# image) are skipped at extraction time.
+_OPERATOR_COMPONENTS: tuple[_Component, ...] = (
+    # Components whose version defaults to Chart.appVersion when unset
+    _Component("operator", app_version=True),
+    _Component("validator", app_version=True),
+    _Component("nodeStatusExporter", app_version=True),
+    # Optional operator init container (not set in the default values.yaml)
+    _Component("operator.initContainer"),
+    # NVIDIA Driver – OS-specific image (e.g. 595.58.03-ubuntu22.04)
+    _Component("driver", os_variants=True),
+    _Component("driver.manager"),
+    _Component("toolkit"),
+    _Component("devicePlugin"),
+    # Standalone DCGM hostengine (optional, disabled by default)
+    _Component("dcgm"),
+    _Component("dcgmExporter"),
+    # GPU Feature Discovery (shares the device-plugin image)
+    _Component("gfd"),
+    _Component("migManager"),
+    # GPUDirect Storage – OS-specific image (e.g. 2.27.3-ubuntu22.04)
+    _Component("gds", os_variants=True),
+    # GDRCopy – OS-specific image (e.g. v2.5.2-ubuntu22.04)
+    _Component("gdrcopy", os_variants=True),
+    # vGPU Manager – main image is user-supplied (repository/version empty by default)
+    _Component("vgpuManager"),
+    _Component("vgpuManager.driverManager"),
+    _Component("vgpuDeviceManager"),
+    _Component("vfioManager"),
+    _Component("vfioManager.driverManager"),
+    # Sandbox Device Plugin (KubeVirt GPU passthrough)
+    _Component("sandboxDevicePlugin"),
+    _Component("kataSandboxDevicePlugin"),
+    # Confidential Computing Manager
+    _Component("ccManager"),
+    # kataManager has no image fields in the default values.yaml (operator-managed),
+    # but the ClusterPolicy template passes them through when they are set.
+    _Component("kataManager"),
+)
+
+# values.yaml subtrees that are handled elsewhere (the NFD subchart values).
+_UNCOVERED_IGNORED_PREFIXES = ("node-feature-discovery",)
+
+
+def _values_at(values: dict, values_path: str) -> dict:
+    """Return the mapping at a dotted values path, or {} if any level is missing."""
+    node = values
+    for key in values_path.split("."):
+        node = node.get(key) if isinstance(node, dict) else None
+        if not isinstance(node, dict):
+            return {}
+    return node
+
+
+def _find_image_blocks(values: dict, path: tuple[str, ...] = ()) -> list[str]:
+    """Return the dotted path of every mapping in values with repository and image keys."""
+    blocks = []
+    if "repository" in values and "image" in values and path:
+        blocks.append(".".join(path))
+    for key, child in values.items():
+        if isinstance(child, dict):
+            blocks.extend(_find_image_blocks(child, (*path, str(key))))
+    return blocks
+
+
+def _uncovered_image_blocks(values: dict) -> list[str]:
+    """Return values.yaml image blocks that no _OPERATOR_COMPONENTS entry covers."""
+    covered = {component.values_path for component in _OPERATOR_COMPONENTS}
+    return [
+        block for block in _find_image_blocks(values)
+        if block not in covered and not block.startswith(_UNCOVERED_IGNORED_PREFIXES)
+    ]
+
+
+def _plan_operator_images(
+    values: dict,
+    app_version: str,
+    operator_version: str | None = None,
+) -> tuple[list[ImageEntry], dict[tuple[str, str, str, str], list[str]]]:
+    """Walk _OPERATOR_COMPONENTS once, without any network I/O.
+
+    Returns the single-tag image entries and the de-duplicated OS-variant
+    lookups, as a mapping from (registry_host, namespace, version, fallback_ref)
+    to the values paths that need it.
+    """
+    entries: list[ImageEntry] = []
+    os_variant_lookups: dict[tuple[str, str, str, str], list[str]] = {}
+
+    for component in _OPERATOR_COMPONENTS:
+        block = _values_at(values, component.values_path)
+        repository = (block.get("repository") or "").strip()
+        image = (block.get("image") or "").strip()
+
+        if component.os_variants:
+            # The convention for OS-specific images is:
+            #     <repository>/<image>:<version>-<os-tag>
+            # e.g., nvcr.io/nvidia/driver:595.58.03-ubuntu22.04
+            version = (block.get("version") or "").strip()
+            if not repository or not image or not version:
+                continue
+            fallback = _build_ref(repository, image, version)  # tag as written in values.yaml (no OS suffix)
+            # Extract the registry host from the repository URL
+            repository_parts = repository.split("/", 1)
+            registry_host = repository_parts[0]
+            # namespace = everything after the host + "/" + image name
+            namespace = f"{repository_parts[1]}/{image}" if len(repository_parts) > 1 else image
+            lookup = (registry_host, namespace, version, fallback)
+            os_variant_lookups.setdefault(lookup, []).append(component.values_path)
+            continue
+
+        origin = "values"
+        if component.app_version:
+            # Use explicit version from component if specified, otherwise use override if provided
+            version = block.get("version") or operator_version
+            if not version:
+                version, origin = app_version, "app-version"
+        else:
+            version = block.get("version") or ""  # empty = user-supplied image not set; skip
+        image_reference = _build_ref(repository, image, version)
+        if image_reference:
+            entries.append(_image_entry(image_reference, component.values_path, origin))
+
+    return entries, os_variant_lookups
+
+
+# --<component>-versions flags and the OS-variant component each one extends.
+_VERSION_SPEC_COMPONENTS = {
+    "driver": "driver",
+    "gds": "gds",
+    "gdrcopy": "gdrcopy",
+}
+
+
+def _select_versions(specs: list[str], configured_version: str, tag_index: _TagIndex) -> list[str]:
+    """Expand --driver-versions style specs against a repository's tag index.
+
+    VERSION     that exact version, e.g. 580.95.05
+    BRANCH      the newest version of that branch, e.g. 580
+    latest:N    the newest N versions of every selected branch; the branch of
+                the values.yaml version is always selected
+
+    Precompiled drivers are versioned by branch (driver.version: "595"), so when
+    the configured version is a bare branch, BRANCH specs are taken literally
+    and latest:N selects the newest N branches.
+    """
+    precompiled = re.fullmatch(r"v?\d+", configured_version) is not None
+    available = tag_index.versions(branch_only=precompiled)
+    latest = 0
+    explicit: list[str] = []
+    branches = {_version_key(configured_version)[:1]}
+    for spec in specs:
+        if spec.startswith("latest:"):
+            latest = max(latest, int(spec[len("latest:"):]))
+        elif re.fullmatch(r"v?\d+", spec) and not precompiled:
+            branches.add(_version_key(spec)[:1])
+            in_branch = [v for v in available if _version_key(v)[:1] == _version_key(spec)[:1]]
+            if in_branch:
+                explicit.append(in_branch[0])
+            else:
+                print(f"  Warning: no {spec}.* versions found in the registry; ignoring {spec}.",
+                      file=sys.stderr)
+        elif tag_index.variants(spec):
+            explicit.append(spec)
+        else:
+            print(f"  Warning: no {spec}-* tags found in the registry; ignoring {spec}.",
+                  file=sys.stderr)
+
+    selected = list(explicit)
+    if latest and precompiled:
+        selected += available[:latest]
+    elif latest:
+        for branch in sorted(branches, reverse=True):
+            selected += [v for v in available if _version_key(v)[:1] == branch][:latest]
+    return sorted(set(selected) - {configured_version}, key=_version_key, reverse=True)
+
+
+def _add_version_lookups(
+    os_variant_lookups: dict[tuple[str, str, str, str], list[str]],
+    version_specs: dict[str, list[str]],
+    client: _RegistryClient,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+) -> dict[tuple[str, str, str, str], list[str]]:
+    """Add an OS-variant lookup for every extra version selected by version_specs.
+
+    version_specs maps a component values path to its --<component>-versions
+    specs.  Each repository's tag list is fetched and indexed once; the extra
+    versions are then resolved from that index by _os_variant_tags.  Extra
+    versions have no fallback reference: a version without OS variants is skipped.
+    """
+    targets = [
+        (lookup, values_path)
+        for lookup, values_paths in os_variant_lookups.items()
+        for values_path in values_paths
+        if version_specs.get(values_path)
+    ]
+    for (registry_host, namespace, _, _), _ in targets:
+        client.add_scope_hints(registry_host, [namespace])
+
+    def expand(target) -> list[tuple[str, str, str, str]]:
+        (registry_host, namespace, version, _), values_path = target
+        try:
+            tag_index = client.tag_index(registry_host, namespace)
+        except Exception as exc:  # noqa: BLE001
+            print(f"  Warning: registry query for {registry_host}/{namespace} failed ({exc}); "
+                  f"ignoring extra {values_path} versions.",
+                  file=sys.stderr)
+            client.metrics.count("lookup_failures", kind="tags")
+            return []
+        selected = _select_versions(version_specs[values_path], version, tag_index)
+        return [(registry_host, namespace, extra_version, "") for extra_version in selected]
+
+    merged = {lookup: list(values_paths) for lookup, values_paths in os_variant_lookups.items()}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for (_, values_path), extra_lookups in zip(targets, executor.map(expand, targets)):
+            for extra_lookup in extra_lookups:
+                values_paths = merged.setdefault(extra_lookup, [])
+                if values_path not in values_paths:
+                    values_paths.append(values_path)
+    return merged
+
+
+def _extract_operator_entries(
+    values: dict,
+    app_version: str,
+    skip_registry: bool,
+    operator_version: str | None = None,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+    client: _RegistryClient | None = None,
+    os_filter: _OSFilter | None = None,
+    version_specs: dict[str, list[str]] | None = None,
+) -> list[ImageEntry]:
+    """Return an entry for every image in the GPU Operator values.yaml.
+
+    For components whose images carry an OS-suffix in the tag
+    (driver, nvidia-fs/GDS, gdrdrv/GDRCopy), the registry is queried to
+    enumerate every available OS variant of the configured version, plus any
+    extra versions selected by version_specs ({values path: specs}).  These
+    lookups are planned and de-duplicated first and then resolved concurrently.
+    """
+    entries, os_variant_lookups = _plan_operator_images(values, app_version, operator_version)
+    if version_specs and not skip_registry:
+        if client is None:
+            with _RegistryClient() as client:
+                return _extract_operator_entries(
+                    values, app_version, skip_registry, operator_version, max_workers, client,
+                    os_filter, version_specs,
+                )
+        os_variant_lookups = _add_version_lookups(
+            os_variant_lookups, version_specs, client, max_workers
+        )
+    lookups = list(os_variant_lookups)
+    for lookup, image_references in zip(
+        lookups, _resolve_os_variants(lookups, skip_registry, max_workers, client, os_filter)
+    ):
+        fallback_ref = lookup[3]
+        for image_reference in image_references:
+            origin = "fallback" if image_reference == fallback_ref else "os-variant"
+            for values_path in os_variant_lookups[lookup]:
+                entries.append(_image_entry(image_reference, values_path, origin))
+
+    return sorted(entries)
+
+
+def _extract_operator_images(
+    values: dict,
+    app_version: str,
+    skip_registry: bool,
+    operator_version: str | None = None,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+    client: _RegistryClient | None = None,
+) -> list[str]:
+    """Return all image references from the GPU Operator values.yaml."""
+    entries = _extract_operator_entries(
+        values, app_version, skip_registry, operator_version, max_workers, client
+    )
+    return sorted({entry.reference for entry in entries})
+
+
+# ---------------------------------------------------------------------------
+# NFD subchart image extraction
+# ---------------------------------------------------------------------------
+
+def _extract_nfd_entries(nfd_values: dict, nfd_chart: dict) -> list[ImageEntry]:
+    """Return the NFD image entry from the bundled NFD subchart.
+
+    nfd_values should already include any overrides the parent chart sets under
+    its ``node-feature-discovery`` key.
+    """
+    image_config = nfd_values.get("image", {})
+    repository = (image_config.get("repository") or "").strip()
+    # NFD uses a single image for all its components (master, worker, gc).
+    # The tag defaults to Chart.AppVersion when not explicitly set.
+    tag = (image_config.get("tag") or "").strip()
+    origin = "values"
+    if not tag:
+        tag, origin = (nfd_chart.get("appVersion") or "").strip(), "app-version"
+    # NFD's repository already contains the image name (no separate 'image' key)
+    if repository and tag:
+        return [_image_entry(f"{repository}:{tag}", "node-feature-discovery.image", origin)]
+    return []
+
+
+def _extract_nfd_images(nfd_values: dict, nfd_chart: dict) -> list[str]:
+    """Return the NFD image reference from the bundled NFD subchart."""
+    return [entry.reference for entry in _extract_nfd_entries(nfd_values, nfd_chart)]
+
+
+# ---------------------------------------------------------------------------
+# Manifest / template image discovery
+# ---------------------------------------------------------------------------
+
+# Cheap pre-filter: files without an image field or *_IMAGE variable are never parsed.
+_DISCOVERY_PREFILTER = re.compile(r"\bimage:|_IMAGE\b")
+_TEMPLATE_IMAGE_LINE = re.compile(r"^\s*(?:-\s*)?image:\s*(.+?)\s*$")
+_TEMPLATE_IMAGE_ENV_NAME = re.compile(r"^\s*(?:-\s*)?name:\s*[\"']?\w+_IMAGE[\"']?\s*$")
+_TEMPLATE_ENV_VALUE_LINE = re.compile(r"^\s*value:\s*(.+?)\s*$")
+_TEMPLATE_VALUES_IMAGE = re.compile(r"\.Values\.([\w.-]+?)\.(?:image|repository|version)\b")
+_TEMPLATE_INCLUDE = re.compile(r'include\s+"([^"]+)"')
+_TEMPLATE_DEFINE = re.compile(r'\{\{-?\s*define\s+"([^"]+)"\s*-?\}\}(.*?)\{\{-?\s*end\s*-?\}\}', re.S)
+# repository[:port]/path[:tag][@digest]; rejects placeholders like "FILLED BY THE OPERATOR"
+_IMAGE_REFERENCE = re.compile(
+    r"^[\w.-]+(?::\d+)?/[\w./-]+(?::[\w.-]+)?(?:@sha256:[0-9a-f]{64})?$"
+)
+_YAML_SAFE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class _DiscoveredImage(NamedTuple):
+    """An image found in a manifest: a literal reference or a values.yaml block path."""
+    source: str
+    reference: str | None = None
+    values_path: str | None = None
+
+
+def _iter_yaml_files(paths: list[str]):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for directory, _, file_names in os.walk(path):
+            for file_name in sorted(file_names):
+                if file_name.endswith((".yaml", ".yml", ".tpl")):
+                    yield os.path.join(directory, file_name)
+
+
+def _walk_manifest_images(node, source: str, found: list[_DiscoveredImage]) -> None:
+    """Collect every string `image:` field and `*_IMAGE` env var in a parsed document."""
+    if isinstance(node, dict):
+        image = node.get("image")
+        if isinstance(image, str) and _IMAGE_REFERENCE.match(image.strip()):
+            found.append(_DiscoveredImage(source, reference=image.strip()))
+        name, value = node.get("name"), node.get("value")
+        if (isinstance(name, str) and name.endswith("_IMAGE")
+                and isinstance(value, str) and _IMAGE_REFERENCE.match(value.strip())):
+            found.append(_DiscoveredImage(source, reference=value.strip()))
+        for child in node.values():
+            _walk_manifest_images(child, source, found)
+    elif isinstance(node, list):
+        for child in node:
+            _walk_manifest_images(child, source, found)
+
+
+def _template_image_expressions(text: str) -> list[str]:
+    """Return the right-hand side of every `image:` line and `*_IMAGE` env value in a template."""
+    expressions = []
+    previous_line = ""
+    for line in text.splitlines():
+        match = _TEMPLATE_IMAGE_LINE.match(line)
+        if not match and _TEMPLATE_IMAGE_ENV_NAME.match(previous_line):
+            match = _TEMPLATE_ENV_VALUE_LINE.match(line)
+        if match:
+            expressions.append(match.group(1).strip("\"'"))
+        previous_line = line
+    return expressions
+
+
+def _scan_manifest_images(paths: list[str]) -> list[_DiscoveredImage]:
+    """Find image references in YAML manifests and Helm templates under paths.
+
+    Plain YAML is streamed with a safe loader, one document at a time.  Helm
+    templates cannot be parsed as YAML, so their `image:` lines and *_IMAGE env
+    values are rendered just far enough to map `.Values.<block>.image` and
+    `include "<helper>"` expressions back to the values.yaml block they read.
+    Files that do not pass the pre-filter are never parsed.
+    """
+    found: list[_DiscoveredImage] = []
+    templates: list[tuple[str, str]] = []
+    helpers: dict[str, str] = {}
+
+    for path in _iter_yaml_files(paths):
+        with open(path) as file_handle:
+            text = file_handle.read()
+        if path.endswith(".tpl"):
+            for name, body in _TEMPLATE_DEFINE.findall(text):
+                values_match = _TEMPLATE_VALUES_IMAGE.search(body)
+                if values_match:
+                    helpers[name] = values_match.group(1)
+            continue
+        if not _DISCOVERY_PREFILTER.search(text):
+            continue
+        if "{{" in text:
+            templates.append((path, text))
+            continue
+        try:
+            for document in yaml.load_all(text, Loader=_YAML_SAFE_LOADER):
+                _walk_manifest_images(document, path, found)
+        except yaml.YAMLError as exc:
+            print(f"  Warning: could not parse {path} ({exc}); skipping.", file=sys.stderr)
+
+    for path, text in templates:
+        for expression in _template_image_expressions(text):
+            values_match = _TEMPLATE_VALUES_IMAGE.search(expression)
+            include_match = _TEMPLATE_INCLUDE.search(expression)
+            if values_match:
+                found.append(_DiscoveredImage(path, values_path=values_match.group(1)))
+            elif include_match and include_match.group(1) in helpers:
+                found.append(_DiscoveredImage(path, values_path=helpers[include_match.group(1)]))
+            elif _IMAGE_REFERENCE.match(expression):
+                found.append(_DiscoveredImage(path, reference=expression))
+
+    return found
+
+
+def _reconcile_discovered_images(
+    discovered: list[_DiscoveredImage],
+    values: dict,
+    images: list[str],
+) -> tuple[list[ImageEntry], list[str]]:
+    """Compare discovered images with the values-based image list.
+
+    Returns (extra image entries to add, mismatch report lines).
+    """
+    covered = {component.values_path: component for component in _OPERATOR_COMPONENTS}
+    listed = set(images)
+    listed_by_repository: dict[str, list[str]] = {}
+    for image_reference in sorted(listed):
+        listed_by_repository.setdefault(_repository_of(image_reference), []).append(image_reference)
+    extra: dict[ImageEntry, None] = {}
+    report: dict[str, None] = {}
+    referenced_paths = set()
+
+    for item in discovered:
+        if item.values_path is not None:
+            referenced_paths.add(item.values_path)
+            if item.values_path in covered:
+                continue
+            block = _values_at(values, item.values_path)
+            image_reference = _build_ref(block.get("repository"), block.get("image"), block.get("version"))
+            if image_reference:
+                extra[_image_entry(image_reference, item.values_path, "discovered")] = None
+                report[f"values block '{item.values_path}' is used for an image in "
+                       f"{item.source} but is not in the component table"] = None
+            continue
+        if item.reference in listed:
+            continue
+        extra[_image_entry(item.reference, item.source, "discovered")] = None
+        listed_references = listed_by_repository.get(_repository_of(item.reference))
+        if listed_references:
+            report[f"{item.reference} found in {item.source} but values.yaml lists "
+                   f"{', '.join(listed_references)}"] = None
+        else:
+            report[f"{item.reference} found in {item.source} but not in values.yaml"] = None
+
+    if any(item.values_path is not None for item in discovered):
+        for values_path, component in covered.items():
+            block = _values_at(values, values_path)
+            if block.get("repository") and values_path not in referenced_paths:
+                report[f"values block '{values_path}' is not referenced by any scanned template"] = None
+
+    return list(extra), list(report)
+
+
+# ---------------------------------------------------------------------------
+# Delta between releases
+# ---------------------------------------------------------------------------
+
+def _load_previous_entries(path: str) -> list[ImageEntry]:
+    """Read a previous output of this script in any of OUTPUT_FORMATS.
+
+    Plain-text lists (and skopeo-sync files) carry no provenance; their entries
+    are attributed to the file they were read from.
+    """
+    with open(path) as file_handle:
+        text = file_handle.read()
+
+    def from_reference(image_reference: str) -> ImageEntry:
+        return _image_entry(image_reference, path, "previous")
+
+    first_line = text.split("\n", 1)[0].strip()
+    if first_line.startswith(",".join(ImageEntry._fields)):
+        return [
+            ImageEntry(**{field: row[field] for field in ImageEntry._fields})
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    try:
+        document = yaml.load(text, Loader=_YAML_SAFE_LOADER)
+    except yaml.YAMLError:
+        document = None
+    if isinstance(document, list) and all(isinstance(item, dict) for item in document):
+        return [
+            ImageEntry(**{field: str(item.get(field, "")) for field in ImageEntry._fields})
+            for item in document
+        ]
+    if isinstance(document, dict) and all(
+        isinstance(registry, dict) and "images" in registry for registry in document.values()
+    ):
+        # skopeo-sync source file: {registry: {images: {repository: [tag or digest]}}}
+        return [
+            from_reference(f"{registry_host}/{namespace}{'@' if ref.startswith('sha256:') else ':'}{ref}")
+            for registry_host, registry in document.items()
+            for namespace, refs in (registry.get("images") or {}).items()
+            for ref in refs
+        ]
+    return [
+        from_reference(line.strip())
+        for line in text.splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+
+
+def _diff_entries(
+    previous: list[ImageEntry],
+    current: list[ImageEntry],
+) -> tuple[list[ImageEntry], list[ImageEntry]]:
+    """Return (added, removed) entries, comparing by image reference."""
+    previous_references = {entry.reference for entry in previous}
+    current_references = {entry.reference for entry in current}
+    added = [entry for entry in current if entry.reference not in previous_references]
+    removed = [entry for entry in previous if entry.reference not in current_references]
+    return sorted(set(added)), sorted(set(removed))
+
+
+def _format_diff(added: list[ImageEntry], removed: list[ImageEntry], output_format: str) -> str:
+    """Render a delta between two image lists.
+
+    text prefixes references with "+ " / "- "; json and yaml emit
+    {"added": [...], "removed": [...]}; csv adds a leading "change" column;
+    skopeo-sync lists only the added images, since those are what must be copied.
+    """
+    if output_format == "text":
+        lines = [f"+ {reference}" for reference in sorted({entry.reference for entry in added})]
+        lines += [f"- {reference}" for reference in sorted({entry.reference for entry in removed})]
+        return "".join(f"{line}\n" for line in lines)
+    if output_format in ("json", "yaml"):
+        document = {
+            "added": [entry._asdict() for entry in added],
+            "removed": [entry._asdict() for entry in removed],
+        }
+        if output_format == "json":
+            return json.dumps(document, indent=2) + "\n"
+        return yaml.safe_dump(document, default_flow_style=False, sort_keys=False)
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(("change", *ImageEntry._fields))
+        writer.writerows(("added", *entry) for entry in added)
+        writer.writerows(("removed", *entry) for entry in removed)
+        return buffer.getvalue()
+    if output_format == "skopeo-sync":
+        return _format_skopeo_sync(added)
+    raise ValueError(f"unknown output format {output_format!r}")
+
+
+# ---------------------------------------------------------------------------
+# OCI image layout mirror
+# ---------------------------------------------------------------------------
+
+_OCI_INDEX_MEDIA_TYPE = "application/vnd.oci.image.index.v1+json"
+_OCI_REF_NAME_ANNOTATION = "org.opencontainers.image.ref.name"
+_BLOB_CHUNK_SIZE = 1 << 20
+
+
+class _Blob(NamedTuple):
+    """A config or layer blob and a repository it can be pulled from."""
+    registry_host: str
+    namespace: str
+    digest: str
+    size: int
+
+
+class _MirrorImage(NamedTuple):
+    """Everything needed to place one image reference into an OCI layout."""
+    reference: str
+    descriptor: dict
+    manifests: list[_Manifest]
+    blobs: list[_Blob]
+
+
+class _MirrorResult(NamedTuple):
+    images: int
+    blobs: int
+    reused_blobs: int
+    bytes_fetched: int
+    failed: list[str]
+
+
+def _digest_hasher(digest: str):
+    algorithm = digest.partition(":")[0]
+    if algorithm not in ("sha256", "sha512"):
+        raise ValueError(f"unsupported digest algorithm in {digest}")
+    return hashlib.new(algorithm)
+
+
+class _OCILayout:
+    """An on-disk OCI image layout (oci-layout, index.json, blobs/<alg>/<hex>).
+
+    Blobs are content-addressed, so content shared by several images is stored
+    once.  Downloads are written under .partial/ and moved into blobs/ only after
+    their digest has been verified, which lets an interrupted run resume them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.join(path, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(path, ".partial"), exist_ok=True)
+        layout_file = os.path.join(path, "oci-layout")
+        if not os.path.exists(layout_file):
+            _write_atomic(layout_file, json.dumps({"imageLayoutVersion": "1.0.0"}).encode())
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> str:
+        algorithm, _, encoded = digest.partition(":")
+        return os.path.join(self.path, "blobs", algorithm, encoded)
+
+    def partial_path(self, digest: str) -> str:
+        return os.path.join(self.path, ".partial", digest.replace(":", "-"))
+
+    def has_blob(self, digest: str, size: int | None = None) -> bool:
+        try:
+            return size is None or os.path.getsize(self.blob_path(digest)) == size
+        except OSError:
+            return False
+
+    def write_blob(self, digest: str, data: bytes) -> None:
+        """Store a small blob (a manifest) after checking it against its digest."""
+        hasher = _digest_hasher(digest)
+        hasher.update(data)
+        if f"{hasher.name}:{hasher.hexdigest()}" != digest:
+            raise RuntimeError(f"content does not match digest {digest}")
+        path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+
+    def commit_partial(self, digest: str) -> None:
+        path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.partial_path(digest), path)
+
+    def add_to_index(self, descriptors: list[dict]) -> None:
+        """Add descriptors to index.json, replacing entries with the same ref name."""
+        index_path = os.path.join(self.path, "index.json")
+        with self._lock:
+            index = {"schemaVersion": 2, "mediaType": _OCI_INDEX_MEDIA_TYPE, "manifests": []}
+            if os.path.exists(index_path):
+                with open(index_path) as file_handle:
+                    index = json.load(file_handle)
+            names = {d["annotations"][_OCI_REF_NAME_ANNOTATION] for d in descriptors}
+            manifests = [
+                d for d in index.get("manifests") or []
+                if (d.get("annotations") or {}).get(_OCI_REF_NAME_ANNOTATION) not in names
+            ]
+            manifests += descriptors
+            manifests.sort(key=lambda d: (d.get("annotations") or {}).get(_OCI_REF_NAME_ANNOTATION, ""))
+            index["manifests"] = manifests
+            _write_atomic(index_path, (json.dumps(index, indent=2) + "\n").encode())
+
+    def cleanup(self) -> None:
+        try:
+            os.rmdir(os.path.join(self.path, ".partial"))
+        except OSError:
+            pass  # not empty: keep unfinished downloads for the next run
+
+
+def _plan_mirror_image(client: _RegistryClient, image_reference: str) -> _MirrorImage:
+    """Fetch the manifest tree of one image and list the blobs it references.
+
+    Manifest lists / OCI indexes are mirrored with every child manifest.
+    Non-distributable (foreign) layers, which carry download URLs, are skipped.
+    """
+    registry_host, namespace, tag = _split_ref(image_reference)
+    name, _, digest = image_reference.partition("@")
+    top = client.manifest(registry_host, namespace, digest or tag, with_body=True)
+
+    manifests: list[_Manifest] = []
+    blobs: list[_Blob] = []
+    pending = [top]
+    while pending:
+        manifest = pending.pop()
+        manifests.append(manifest)
+        document = manifest.document or {}
+        if manifest.is_index:
+            pending += [
+                client.manifest(registry_host, namespace, child["digest"], with_body=True)
+                for child in document.get("manifests") or []
+            ]
+            continue
+        for descriptor in [document.get("config"), *(document.get("layers") or [])]:
+            if descriptor and not descriptor.get("urls"):
+                blobs.append(_Blob(registry_host, namespace, descriptor["digest"], descriptor["size"]))
+
+    descriptor = {
+        "mediaType": top.media_type,
+        "digest": top.digest,
+        "size": len(top.raw or b""),
+        "annotations": {_OCI_REF_NAME_ANNOTATION: name},
+    }
+    return _MirrorImage(image_reference, descriptor, manifests, blobs)
+
+
+def _plan_mirror(
+    images: list[str],
+    client: _RegistryClient,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+) -> dict[str, _MirrorImage | None]:
+    """Fetch the manifest trees of images concurrently; failed images map to None."""
+    for image_reference in images:
+        registry_host, namespace, _ = _split_ref(image_reference)
+        client.add_scope_hints(registry_host, [namespace])
+
+    def plan(image_reference: str) -> _MirrorImage | None:
+        try:
+            return _plan_mirror_image(client, image_reference)
+        except Exception as exc:  # noqa: BLE001
+            print(f"  Warning: could not fetch manifests for {image_reference} ({exc}).",
+                  file=sys.stderr)
+            client.metrics.count("lookup_failures", kind="manifests")
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return dict(zip(images, executor.map(plan, images)))
+
+
+def _download_blob(client: _RegistryClient, layout: _OCILayout, blob: _Blob) -> int:
+    """Download blob into layout unless already present; return the bytes fetched.
+
+    A partial download left by an earlier run is resumed with a Range request;
+    registries that ignore Range (200 instead of 206) restart it from scratch.
+    """
+    if layout.has_blob(blob.digest, blob.size):
+        return 0
+    partial_path = layout.partial_path(blob.digest)
+    url = f"{client.base_url(blob.registry_host)}/v2/{blob.namespace}/blobs/{blob.digest}"
+    fetched = 0
+
+    for attempt in range(client.retries + 1):
+        hasher = _digest_hasher(blob.digest)
+        offset = 0
+        if os.path.exists(partial_path):
+            with open(partial_path, "rb") as file_handle:
+                for chunk in iter(lambda: file_handle.read(_BLOB_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+                    offset += len(chunk)
+        if offset > blob.size:
+            os.remove(partial_path)
+            continue
+        if offset == blob.size:
+            open(partial_path, "ab").close()
+            break
+
+        def sink(response) -> None:
+            nonlocal hasher, fetched
+            mode = "ab"
+            if response.status != 206:
+                mode, hasher = "wb", _digest_hasher(blob.digest)
+            with open(partial_path, mode) as file_handle:
+                for chunk in iter(lambda: response.read(_BLOB_CHUNK_SIZE), b""):
+                    file_handle.write(chunk)
+                    hasher.update(chunk)
+                    fetched += len(chunk)
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            client.authorized_request("GET", blob.registry_host, blob.namespace, url, headers, sink)
+        except _RegistryHTTPError as exc:
+            if exc.status != 416 or attempt >= client.retries:
+                raise
+            os.remove(partial_path)  # stale partial larger than what the registry serves
+            continue
+        except (OSError, http.client.HTTPException):
+            if attempt >= client.retries:
+                raise
+            client._sleep_before_retry(attempt, None)
+            continue
+        # A dropped connection ends the body early without raising; keep the
+        # partial and resume it with a Range request
+        received = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        if received >= blob.size:
+            break
+        if attempt >= client.retries:
+            raise RuntimeError(f"download of {blob.digest} stopped at {received} of {blob.size} bytes")
+        client._sleep_before_retry(attempt, None)
+
+    if f"{hasher.name}:{hasher.hexdigest()}" != blob.digest:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise RuntimeError(f"downloaded content does not match {blob.digest}")
+    layout.commit_partial(blob.digest)
+    return fetched
+
+
+def _mirror_images(
+    images: list[str],
+    layout_path: str,
+    client: _RegistryClient,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+) -> _MirrorResult:
+    """Copy images into an OCI image layout at layout_path.
+
+    Manifests are resolved concurrently first, then every distinct blob is
+    downloaded exactly once by a bounded worker pool, however many images share
+    it.  Images are added to index.json only after all of their content is on
+    disk, so the layout never references missing blobs.
+    """
+    layout = _OCILayout(layout_path)
+    planned = _plan_mirror(images, client, max_workers)
+
+    blobs: dict[str, _Blob] = {}
+    for mirror_image in planned.values():
+        for blob in mirror_image.blobs if mirror_image else ():
+            blobs.setdefault(blob.digest, blob)
+    reused = sum(layout.has_blob(blob.digest, blob.size) for blob in blobs.values())
+
+    def download(blob: _Blob) -> int | None:
+        try:
+            return _download_blob(client, layout, blob)
+        except Exception as exc:  # noqa: BLE001
+            print(f"  Warning: could not download {blob.registry_host}/{blob.namespace}"
+                  f"@{blob.digest} ({exc}).",
+                  file=sys.stderr)
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        downloaded = dict(zip(blobs, executor.map(download, blobs.values())))
+
+    failed: list[str] = []
+    descriptors: list[dict] = []
+    for image_reference, mirror_image in planned.items():
+        if mirror_image is None or any(downloaded[b.digest] is None for b in mirror_image.blobs):
+            failed.append(image_reference)
+            continue
+        for manifest in mirror_image.manifests:
+            layout.write_blob(manifest.digest, manifest.raw or b"")
+        descriptors.append(mirror_image.descriptor)
+    layout.add_to_index(descriptors)
+    layout.cleanup()
+
+    return _MirrorResult(
+        images=len(descriptors),
+        blobs=len(blobs),
+        reused_blobs=reused,
+        bytes_fetched=sum(size for size in downloaded.values() if size),
+        failed=failed,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Transfer size estimate
+# ---------------------------------------------------------------------------
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    value = float(size)
+    for unit in ("KiB", "MiB", "GiB"):
+        value /= 1024
+        if value < 1024 or unit == "GiB":
+            break
+    return f"{value:.1f} {unit}"
+
+
+def _estimate_group(
+    groups: dict[str, tuple[set[str], set[str]]],
+    blob_sizes: dict[str, int],
+    blob_groups: dict[str, set[str]],
+) -> dict[str, dict]:
+    """Summarise {name: (image references, blob digests)} into images/bytes/exclusive_bytes."""
+    return {
+        name: {
+            "images": len(references),
+            "bytes": sum(blob_sizes[digest] for digest in digests),
+            # what leaving this group out of the mirror would save
+            "exclusive_bytes": sum(
+                blob_sizes[digest] for digest in digests if blob_groups[digest] == {name}
+            ),
+        }
+        for name, (references, digests) in sorted(groups.items())
+    }
+
+
+def _estimate_transfer(
+    entries: list[ImageEntry],
+    client: _RegistryClient,
+    max_workers: int = DEFAULT_REGISTRY_WORKERS,
+) -> dict:
+    """Estimate the compressed size of mirroring entries without fetching any blob.
+
+    Manifests (and every platform manifest of multi-arch indexes) are fetched
+    concurrently; config and layer sizes come from their descriptors.  Blobs
+    are deduplicated by digest, overall and within each component / OS variant,
+    and exclusive_bytes counts the blobs no other component / OS variant uses.
+    """
+    planned = _plan_mirror(sorted({entry.reference for entry in entries}), client, max_workers)
+
+    blob_sizes: dict[str, int] = {}
+    total_bytes = 0
+    for mirror_image in planned.values():
+        image_blobs = {blob.digest: blob.size for blob in mirror_image.blobs} if mirror_image else {}
+        blob_sizes.update(image_blobs)
+        total_bytes += sum(image_blobs.values())
+
+    def grouped(key) -> dict[str, dict]:
+        groups: dict[str, tuple[set[str], set[str]]] = {}
+        blob_groups: dict[str, set[str]] = {}
+        for entry in entries:
+            name = key(entry)
+            mirror_image = planned.get(entry.reference)
+            if name is None or mirror_image is None:
+                continue
+            references, digests = groups.setdefault(name, (set(), set()))
+            references.add(entry.reference)
+            for blob in mirror_image.blobs:
+                digests.add(blob.digest)
+                blob_groups.setdefault(blob.digest, set()).add(name)
+        return _estimate_group(groups, blob_sizes, blob_groups)
+
+    def os_variant(entry: ImageEntry) -> str | None:
+        if entry.origin != "os-variant":
+            return None
+        return _split_os_suffix(entry.version)[1]
+
+    unique_bytes = sum(blob_sizes.values())
+    return {
+        "images": sum(mirror_image is not None for mirror_image in planned.values()),
+        "unresolved": sorted(ref for ref, mirror_image in planned.items() if mirror_image is None),
+        "blobs": len(blob_sizes),
+        "total_bytes": total_bytes,
+        "unique_bytes": unique_bytes,
+        "shared_bytes": total_bytes - unique_bytes,
+        "components": grouped(lambda entry: entry.component),
+        "os_variants": grouped(os_variant),
+    }
+
+
+def _format_estimate(estimate: dict, output_format: str) -> str:
+    if output_format == "json":
+        return json.dumps(estimate, indent=2) + "\n"
+    if output_format == "yaml":
+        return yaml.safe_dump(estimate, default_flow_style=False, sort_keys=False)
+
+    lines = [
+        f"Images:                  {estimate['images']}",
+        f"Distinct blobs:          {estimate['blobs']}",
+        f"Total (sum per image):   {_format_size(estimate['total_bytes'])}",
+        f"Unique (deduplicated):   {_format_size(estimate['unique_bytes'])}",
+        f"Shared between images:   {_format_size(estimate['shared_bytes'])}",
+    ]
+    for title, key in (("Component", "components"), ("OS variant", "os_variants")):
+        if not estimate[key]:
+            continue
+        lines += ["", f"{title:<32} {'Images':>6} {'Size':>12} {'Exclusive':>12}"]
+        for name, group in estimate[key].items():
+            lines.append(f"{name:<32} {group['images']:>6} {_format_size(group['bytes']):>12} "
+                         f"{_format_size(group['exclusive_bytes']):>12}")
+    if estimate["unresolved"]:
+        lines += ["", "Unresolved (not counted):"] + [f"  {ref}" for ref in estimate["unresolved"]]
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Run result cache
+# ---------------------------------------------------------------------------
+
+# Options that change how a run executes or is observed, but not what it writes.
+_RESULT_CACHE_IGNORED_OPTIONS = frozenset({
+    "jobs", "retries", "retry_backoff", "cache_dir", "cache_ttl", "offline", "refresh",
+    "trace", "metrics_out",
+    # Derived from other options by _parse_args
+    "os_filter", "version_specs", "result_outputs",
+})
+# Changes listed individually before the rest are summarized as "and N more".
+_RESULT_CACHE_MAX_REASONS = 5
+
+
+def _hash_file(path: str) -> str | None:
+    """sha256 of the file at path, or None if it cannot be read."""
+    hasher = hashlib.sha256()
+    try:
+        with open(path, "rb") as file_handle:
+            for chunk in iter(lambda: file_handle.read(1 << 16), b""):
+                hasher.update(chunk)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def _input_digests(paths: list[str]) -> dict[str, str | None]:
+    """Hash every input path; a directory contributes every file below it."""
+    digests: dict[str, str | None] = {}
+    for path in paths:
+        if not os.path.isdir(path):
+            digests[path] = _hash_file(path)
+            continue
+        for directory, subdirectories, file_names in os.walk(path):
+            subdirectories.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(directory, file_name)
+                digests[file_path] = _hash_file(file_path)
+    return digests
+
+
+def _tags_digest(tags: list[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(tags)).encode()).hexdigest()
+
+
+def _run_input_paths(args: argparse.Namespace) -> list[str]:
+    """Every file or directory whose content the output of this run depends on."""
+    paths = [args.values, args.chart]
+    if not args.no_nfd:
+        paths += [args.nfd_values, args.nfd_chart]
+    paths += args.overlay
+    if args.nodes_json:
+        paths.append(args.nodes_json)
+    if args.diff_against:
+        paths.append(args.diff_against)
+    if args.diff_against_values:
+        paths += [args.diff_against_values, args.diff_against_chart or args.chart]
+    if args.discover:
+        paths += args.discover_path
+    return list(dict.fromkeys(paths))
+
+
+def _fingerprint_changes(previous: dict, current: dict) -> list[str]:
+    """Describe how the fingerprint of a stored result differs from this run's."""
+    changes = []
+    if previous.get("generator") != current["generator"]:
+        changes.append("image_list.py changed")
+    previous_inputs, current_inputs = previous.get("inputs", {}), current["inputs"]
+    for path in sorted(previous_inputs.keys() | current_inputs.keys()):
+        if path not in previous_inputs:
+            changes.append(f"{path} is a new input")
+        elif path not in current_inputs:
+            changes.append(f"{path} is no longer an input")
+        elif current_inputs[path] is None and previous_inputs[path] is not None:
+            changes.append(f"{path} was removed")
+        elif previous_inputs[path] != current_inputs[path]:
+            changes.append(f"{path} changed")
+    previous_options, current_options = previous.get("options", {}), current["options"]
+    for option in sorted(previous_options.keys() | current_options.keys()):
+        if previous_options.get(option) != current_options.get(option):
+            changes.append(f"--{option.replace('_', '-')} changed "
+                           f"({previous_options.get(option)!r} -> {current_options.get(option)!r})")
+    return changes
+
+
+class _ResultCache:
+    """Whole-run cache of the outputs of one invocation, kept under <cache-dir>/.results/.
+
+    Entries are keyed by what the run writes (the command and --output or
+    --output-dir) and record a fingerprint of everything the output depends on:
+    this script, the content of every input file, the options that affect the
+    output and the tag lists the run used.  A run with the same fingerprint
+    replays the stored outputs without parsing a chart or contacting the
+    registry; otherwise lookup() says what changed.
+
+    Digests, platforms and sizes come from the registry rather than from the
+    tag cache, so outside --offline a result expires after --cache-ttl just
+    like the tag lists it was built from.
+    """
+
+    def __init__(self, tag_cache: _TagCache):
+        self.tag_cache = tag_cache
+
+    def _path(self, args: argparse.Namespace) -> str:
+        slot = json.dumps([
+            args.command,
+            os.path.abspath(args.output) if args.output else None,
+            os.path.abspath(args.output_dir) if args.output_dir else None,
+        ])
+        return os.path.join(
+            self.tag_cache.cache_dir, ".results", hashlib.sha256(slot.encode()).hexdigest() + ".json"
+        )
+
+    @staticmethod
+    def fingerprint(args: argparse.Namespace) -> dict:
+        options = {
+            option: value
+            for option, value in sorted(vars(args).items())
+            if option not in _RESULT_CACHE_IGNORED_OPTIONS
+        }
+        return {
+            "generator": _hash_file(os.path.abspath(__file__)),
+            "inputs": _input_digests(_run_input_paths(args)),
+            # Round-trip so the comparison sees what a stored entry would contain
+            "options": json.loads(json.dumps(options)),
+        }
+
+    def lookup(self, args: argparse.Namespace, fingerprint: dict) -> tuple[dict | None, list[str]]:
+        """Return (stored entry, []) if it is still valid, else (None, reasons)."""
+        try:
+            with open(self._path(args)) as file_handle:
+                entry = json.load(file_handle)
+        except FileNotFoundError:
+            return None, ["no previous result"]
+        except (OSError, ValueError):
+            return None, ["previous result is unreadable"]
+
+        reasons = _fingerprint_changes(entry.get("fingerprint", {}), fingerprint)
+        tag_cache = self.tag_cache
+        if not args.skip_registry and not tag_cache.offline:
+            age = time.time() - entry.get("created_at", 0)
+            if age >= tag_cache.ttl:
+                reasons.append(f"result is {age:.0f}s old (--cache-ttl {tag_cache.ttl:g})")
+        for key, tags_digest in sorted(entry.get("tags", {}).items()):
+            registry_host, namespace = key.split("/", 1)
+            cached_entry = tag_cache.load(registry_host, namespace)
+            if cached_entry is None:
+                reasons.append(f"tag list for {key} is no longer cached")
+            elif _tags_digest(_tags_from_pages(cached_entry["pages"])) != tags_digest:
+                reasons.append(f"tag list for {key} changed")
+            elif not tag_cache.offline and not tag_cache.is_fresh(cached_entry):
+                reasons.append(f"tag list for {key} is older than --cache-ttl")
+        if len(reasons) > _RESULT_CACHE_MAX_REASONS:
+            hidden = len(reasons) - _RESULT_CACHE_MAX_REASONS
+            reasons = reasons[:_RESULT_CACHE_MAX_REASONS] + [f"and {hidden} more"]
+        return (None, reasons) if reasons else (entry, [])
+
+    def store(
+        self,
+        args: argparse.Namespace,
+        fingerprint: dict,
+        outputs: list[tuple[str | None, str]],
+    ) -> None:
+        """Atomically record the outputs of this run and the tag lists it used."""
+        path = self._path(args)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "created_at": time.time(),
+            "fingerprint": fingerprint,
+            "tags": {
+                f"{registry_host}/{namespace}": _tags_digest(tags)
+                for (registry_host, namespace), tags in self.tag_cache.fetched.items()
+            },
+            "outputs": [{"path": output_path, "text": text} for output_path, text in outputs],
+        }
+        _write_atomic(path, json.dumps(entry).encode())
+
+    @staticmethod
+    def replay(entry: dict) -> None:
+        """Write the outputs of a stored run again."""
+        for output in entry["outputs"]:
+            if output["path"]:
+                os.makedirs(os.path.dirname(os.path.abspath(output["path"])), exist_ok=True)
+            _write_output(output["text"], output["path"])
+
+
+# ---------------------------------------------------------------------------
+# Library session and serve command
+# ---------------------------------------------------------------------------
+
+# Options an _ImageListSession accepts per call.  serve takes the list, flag and
+# value options from HTTP requests; the file paths only from the Python API.
+_SESSION_LIST_OPTIONS = (
+    "os", "exclude_os", "kernel", "platforms", "driver_versions", "gds_versions", "gdrcopy_versions",
+)
+_SESSION_FLAG_OPTIONS = ("resolve_digests", "expand_platforms")
+_SESSION_VALUE_OPTIONS = ("gpu_operator_version",)
+_SESSION_PATH_OPTIONS = ("values", "chart", "nodes_json")
+_SESSION_CALL_OPTIONS = (
+    _SESSION_LIST_OPTIONS + _SESSION_FLAG_OPTIONS + _SESSION_VALUE_OPTIONS + _SESSION_PATH_OPTIONS
+)
+# Options that are fixed when the session is created.
+_SESSION_SETTINGS = (
+    "nfd_values", "nfd_chart", "no_nfd", "skip_registry", "cache_dir", "cache_ttl", "offline",
+    "jobs", "retries", "retry_backoff", "insecure_registry", "discover", "discover_path",
+)
+_SESSION_LIST_SETTINGS = ("insecure_registry", "discover_path")
+
+_CONTENT_TYPES = {
+    "json": "application/json",
+    "yaml": "application/yaml",
+    "skopeo-sync": "application/yaml",
+    "csv": "text/csv",
+}
+
+
+def _session_options(options: dict) -> dict:
+    """Return options with list options as lists; a single string becomes a one-item list."""
+    normalized = {}
+    for option, value in options.items():
+        if option in _SESSION_LIST_OPTIONS or option in _SESSION_LIST_SETTINGS:
+            value = [value] if isinstance(value, str) else list(value or ())
+        normalized[option] = value
+    return normalized
+
+
+class _ImageListSession:
+    """Generates image lists repeatedly from one set of options.
+
+    Parsed chart files (reloaded when they change on disk), the --discover
+    manifest scan, pull tokens, pooled connections and tag lists are kept
+    between calls, so only the first call pays for them.  Tag lists and
+    manifests held in memory are dropped after --cache-ttl so a long-lived
+    session notices registry changes.  Thread-safe; backs the serve command and
+    the importable image_list module.
+    """
+
+    def __init__(self, args: argparse.Namespace, metrics: _Metrics | None = None):
+        self.args = args
+        self.client = _RegistryClient(
+            _TagCache(args.cache_dir, args.cache_ttl, args.offline),
+            retries=args.retries,
+            backoff=args.retry_backoff,
+            plain_http_hosts=args.insecure_registry,
+            metrics=metrics,
+        )
+        self._lock = threading.Lock()
+        self._chart_inputs: dict[tuple[str, str], tuple[tuple, "_ChartInputs"]] = {}
+        self._discovered: list[_DiscoveredImage] | None = None
+        self._warm_since = time.monotonic()
+
+    @classmethod
+    def from_options(cls, **options) -> "_ImageListSession":
+        """Create a session from command-line defaults overridden by options (flag dest names)."""
+        unknown = set(options) - set(_SESSION_CALL_OPTIONS) - set(_SESSION_SETTINGS)
+        if unknown:
+            raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+        args = _parse_args([])
+        for option, value in _session_options(options).items():
+            setattr(args, option, value)
+        _derive_options(args)
+        return cls(args)
+
+    def __enter__(self) -> "_ImageListSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.client.close()
+
+    def options(self, **options) -> argparse.Namespace:
+        """Return the session's arguments with per-call options applied.
+
+        List options replace the session's value rather than extending it.
+        """
+        unknown = set(options) - set(_SESSION_CALL_OPTIONS)
+        if unknown:
+            raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+        args = argparse.Namespace(**{**vars(self.args), **_session_options(options)})
+        _derive_options(args)
+        return args
+
+    def _refresh(self) -> None:
+        """Forget registry state (and start new metrics) once --cache-ttl has passed."""
+        if time.monotonic() - self._warm_since < self.args.cache_ttl:
+            return
+        self.client.forget_registry_state()
+        self.client.metrics = _Metrics()
+        self._discovered = None
+        self._warm_since = time.monotonic()
+
+    def chart_inputs(self, values_path: str, chart_path: str) -> "_ChartInputs":
+        """Return the parsed chart files, parsing them again only if one changed."""
+        paths = [values_path, chart_path]
+        if not self.args.no_nfd:
+            paths += [self.args.nfd_values, self.args.nfd_chart]
+        stamp = tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths)
+        with self._lock:
+            self._refresh()
+            cached = self._chart_inputs.get((values_path, chart_path))
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, _load_chart_inputs(values_path, chart_path, self.args))
+                self._chart_inputs[(values_path, chart_path)] = cached
+            if self.args.discover and self._discovered is None:
+                self._discovered = _scan_manifest_images(self.args.discover_path)
+        return cached[1]
+
+    def image_list(
+        self,
+        overlay: dict | str | None = None,
+        **options,
+    ) -> tuple[list[ImageEntry], dict[str, list[str] | None] | None]:
+        """Return the entries for the chart with overlay (values or a path) merged on top.
+
+        The second item maps each reference to its platforms when the
+        platforms option is set, and is None otherwise.
+        """
+        args = self.options(**options)
+        inputs = self.chart_inputs(args.values, args.chart)
+        if isinstance(overlay, str):
+            overlay = _load_overlay(overlay)
+        if overlay:
+            inputs = inputs._replace(values=_deep_merge(inputs.values, overlay))
+        entries = _generate_image_entries(inputs, args, self.client, self._discovered)
+        annotations = None
+        if args.platforms:
+            annotations = _platform_annotations(entries, self.client, args.platforms, args.jobs)
+        return entries, annotations
+
+    def os_variants(self, repository: str, version: str, **options) -> list[str]:
+        """Return the OS-variant references of repository (registry/namespace) at version."""
+        args = self.options(**options)
+        registry_host, namespace, _ = _split_ref(f"{repository}:{version}")
+        with self._lock:
+            self._refresh()
+        return _os_variant_tags(
+            registry_host, namespace, version, "", args.skip_registry, self.client, args.os_filter
+        )
+
+
+def _session_request(
+    request: dict,
+    default_format: str,
+    overlay_dir: str | None = None,
+) -> tuple[dict | str | None, str, dict]:
+    """Split a serve request (JSON body or query parameters) into overlay, format and options.
+
+    The overlay is a values mapping or the name of a file or directory inside
+    overlay_dir; no other file on the server can be named by a request.
+    """
+    overlay, output_format, options = None, default_format, {}
+    for key, value in request.items():
+        option = key.replace("-", "_")
+        if isinstance(value, list) and option not in _SESSION_LIST_OPTIONS and option != "overlay":
+            value = value[-1]
+        if option == "overlay":
+            overlay = value
+        elif option == "format":
+            if value not in OUTPUT_FORMATS:
+                raise ValueError(f"unknown format {value!r}")
+            output_format = value
+        elif option in _SESSION_LIST_OPTIONS:
+            options[option] = [value] if isinstance(value, str) else [str(item) for item in value]
+        elif option in _SESSION_FLAG_OPTIONS:
+            options[option] = value is True or str(value).lower() in ("1", "true", "yes")
+        elif option in _SESSION_VALUE_OPTIONS:
+            options[option] = str(value)
+        else:
+            raise ValueError(f"unknown option {key!r}")
+    if isinstance(overlay, list):
+        overlay = overlay[-1]
+    if isinstance(overlay, str):
+        if not overlay_dir:
+            raise ValueError("overlay must be a values mapping (serve was started without --overlay-dir)")
+        root = os.path.realpath(overlay_dir)
+        path = os.path.realpath(os.path.join(root, overlay))
+        if not path.startswith(root + os.sep) or not os.path.exists(path):
+            raise ValueError(f"no overlay {overlay!r} in --overlay-dir")
+        overlay = path
+    elif overlay is not None and not isinstance(overlay, dict):
+        raise ValueError("overlay must be a values mapping or an --overlay-dir entry")
+    return overlay, output_format, options
+
+
+def _session_handler(session: _ImageListSession, default_format: str, overlay_dir: str | None = None):
+    """Build the request handler class of the serve command."""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            query = urllib.parse.urlsplit(self.path).query
+            self._dispatch(urllib.parse.parse_qs(query, keep_blank_values=True))
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                request = json.loads(body) if body else {}
+            except ValueError as exc:
+                self._reply(400, f"invalid JSON body: {exc}\n")
+                return
+            if not isinstance(request, dict):
+                self._reply(400, "the JSON body must be an object\n")
+                return
+            self._dispatch(request)
+
+        def _dispatch(self, request: dict) -> None:
+            path = urllib.parse.urlsplit(self.path).path
+            if path == "/healthz":
+                self._reply(200, "ok\n")
+                return
+            if path != "/images":
+                self._reply(404, f"unknown path {path}; use /images\n")
+                return
+            try:
+                overlay, output_format, options = _session_request(request, default_format, overlay_dir)
+                entries, annotations = session.image_list(overlay, **options)
+            except (OSError, ValueError, yaml.YAMLError) as exc:
+                self._reply(400, f"{exc}\n")
+                return
+            except Exception as exc:  # noqa: BLE001
+                self._reply(500, f"{exc}\n")
+                return
+            self._reply(
+                200,
+                _format_entries(entries, output_format, annotations),
+                _CONTENT_TYPES.get(output_format, "text/plain"),
+            )
+
+        def _reply(self, status: int, text: str, content_type: str = "text/plain") -> None:
+            data = text.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def _serve(args: argparse.Namespace) -> None:
+    """serve: answer GET/POST /images until interrupted, keeping the session warm."""
+    with _ImageListSession(args) as session:
+        server = http.server.ThreadingHTTPServer(
+            args.listen_address, _session_handler(session, args.format, args.overlay_dir)
+        )
+        server.daemon_threads = True
+        host, port = server.server_address[:2]
+        print(f"Serving image lists on http://{host}:{port}/images", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+class ImageList(NamedTuple):
+    """The result of one query.
+
+    entries     sorted ImageEntry tuples, one per image and values key
+    platforms   reference -> platforms it provides (None if it could not be
+                inspected), when the platforms option was given; otherwise None
+    """
+    entries: list[ImageEntry]
+    platforms: dict[str, list[str] | None] | None = None
+
+    @property
+    def images(self) -> list[str]:
+        """The sorted, distinct image references."""
+        return sorted({entry.reference for entry in self.entries})
+
+    def format(self, output_format: str = "text") -> str:
+        """Render the list exactly as generate-image-list.py --format would."""
+        return _format_entries(self.entries, output_format, self.platforms)
+
+
+class ImageListGenerator:
+    """Answers image list queries for one chart, keeping its state warm between calls."""
+
+    def __init__(self, **options):
+        self._session = _ImageListSession.from_options(**options)
+
+    def __enter__(self) -> "ImageListGenerator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "ImageListGenerator":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the pooled registry connections."""
+        self._session.close()
+
+    def images(self, overlay: dict | str | None = None, **options) -> ImageList:
+        """List the images of the chart with overlay (a values mapping or file/directory path) merged on top."""
+        entries, platforms = self._session.image_list(overlay, **options)
+        return ImageList(entries, platforms)
+
+    def os_variants(self, repository: str, version: str, **options) -> list[str]:
+        """List the OS-variant references of repository (e.g. nvcr.io/nvidia/driver) at version."""
+        return self._session.os_variants(repository, version, **options)
+
+    async def images_async(self, overlay: dict | str | None = None, **options) -> ImageList:
+        return await asyncio.to_thread(self.images, overlay, **options)
+
+    async def os_variants_async(self, repository: str, version: str, **options) -> list[str]:
+        return await asyncio.to_thread(self.os_variants, repository, version, **options)
+
+
+def generate_image_list(overlay: dict | str | None = None, **options) -> ImageList:
+    """One-shot form of ImageListGenerator(**options).images(overlay)."""
+    with ImageListGenerator(**options) as generator:
+        return generator.images(overlay)
+
+
+async def generate_image_list_async(overlay: dict | str | None = None, **options) -> ImageList:
+    return await asyncio.to_thread(generate_image_list, overlay, **options)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _derive_options(args: argparse.Namespace) -> None:
+    """Validate the list options and derive platforms, version_specs and os_filter.
+
+    Shared by the command line and _ImageListSession, which applies per-call
+    options to a copy of its arguments; raises ValueError on invalid input.
+    """
+    args.platforms = list(dict.fromkeys(
+        _normalize_platform(platform)
+        for value in args.platforms
+        for platform in value.split(",")
+        if platform.strip()
+    ))
+    args.version_specs = {}
+    for option, values_path in _VERSION_SPEC_COMPONENTS.items():
+        specs = [
+            spec.strip()
+            for value in getattr(args, f"{option}_versions")
+            for spec in value.split(",")
+            if spec.strip()
+        ]
+        for spec in specs:
+            if spec.startswith("latest:") and not spec[len("latest:"):].isdigit():
+                raise ValueError(f"--{option}-versions: expected latest:N, got {spec!r}")
+        if specs and args.skip_registry:
+            raise ValueError(f"--{option}-versions cannot be combined with --skip-registry")
+        if specs:
+            args.version_specs[values_path] = specs
+    try:
+        if args.nodes_json:
+            args.os_filter = _OSFilter.from_nodes(args.nodes_json, args.os, args.exclude_os, args.kernel)
+        else:
+            args.os_filter = _OSFilter(args.os, args.exclude_os, args.kernel)
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"--nodes-json: {exc}") from exc
+    if args.offline and not args.cache_dir:
+        raise ValueError("--offline requires --cache-dir")
+    if args.resolve_digests and args.skip_registry:
+        raise ValueError("--resolve-digests cannot be combined with --skip-registry")
+    if args.platforms and args.skip_registry:
+        raise ValueError("--platforms cannot be combined with --skip-registry")
+    if args.expand_platforms and not args.resolve_digests:
+        raise ValueError("--expand-platforms requires --resolve-digests")
+    missing_paths = [path for path in args.discover_path if not os.path.exists(path)] if args.discover else []
+    if missing_paths:
+        raise ValueError(f"--discover-path: {', '.join(missing_paths)} does not exist")
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    repo_root = os.path.join(script_dir, "..", "..")
+    chart_dir = os.path.join(repo_root, "deployments", "gpu-operator")
+    nfd_dir = os.path.join(chart_dir, "charts", "node-feature-discovery")
+
+    parser = argparse.ArgumentParser(
+        description="Generate a list of all container images required by the GPU Operator.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=("list", "mirror", "serve"),
+        default="list",
+        help="list (default) writes the image list; mirror copies the images into "
+             "the OCI image layout given by --layout; serve answers image list "
+             "queries over HTTP on --listen",
+    )
+    parser.add_argument(
+        "--values",
+        default=os.path.join(chart_dir, "values.yaml"),
+        metavar="PATH",
+        help="Path to gpu-operator values.yaml",
+    )
+    parser.add_argument(
+        "--chart",
+        default=os.path.join(chart_dir, "Chart.yaml"),
+        metavar="PATH",
+        help="Path to gpu-operator Chart.yaml",
+    )
+    parser.add_argument(
+        "--nfd-values",
+        default=os.path.join(nfd_dir, "values.yaml"),
+        metavar="PATH",
+        help="Path to the bundled NFD subchart values.yaml",
+    )
+    parser.add_argument(
+        "--nfd-chart",
+        default=os.path.join(nfd_dir, "Chart.yaml"),
+        metavar="PATH",
+        help="Path to the bundled NFD subchart Chart.yaml",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        metavar="PATH",
+        help="Write image list to PATH instead of stdout",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(OUTPUT_FORMATS),
+        default="text",
+        help="Output format: a plain list (text), entries with provenance "
+             "(json, yaml, csv) or a skopeo sync source file (skopeo-sync)",
+    )
+    parser.add_argument(
+        "--no-nfd",
+        action="store_true",
+        help="Exclude NFD subchart images from the output",
+    )
+    parser.add_argument(
+        "--skip-registry",
+        action="store_true",
+        help="Skip registry tag lookups; use the version from values.yaml as-is "
+             "(no OS-variant expansion for driver/gds/gdrcopy)",
+    )
+    parser.add_argument(
+        "--gpu-operator-version",
+        default=None,
+        metavar="VERSION",
+        help="Override the gpu-operator image version (e.g., v1.0.0)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_REGISTRY_WORKERS,
+        metavar="N",
+        help="Maximum number of concurrent registry lookups "
+             f"(default: {DEFAULT_REGISTRY_WORKERS})",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        metavar="PATH",
+        help="Cache registry tag lists, and the results of whole runs, on disk under PATH",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        metavar="SECONDS",
+        help="Age after which cached tag lists are revalidated with the registry "
+             f"(default: {DEFAULT_CACHE_TTL})",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Never contact the registry; serve tag lists from --cache-dir even if stale",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Recompute the output even if the result cached in --cache-dir is still valid",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        metavar="N",
+        help="Retry 429/5xx responses and connection errors up to N times "
+             f"(default: {DEFAULT_RETRIES})",
+    )
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=DEFAULT_RETRY_BACKOFF,
+        metavar="SECONDS",
+        help="Initial retry delay, doubled after every attempt "
+             f"(default: {DEFAULT_RETRY_BACKOFF})",
+    )
+    parser.add_argument(
+        "--insecure-registry",
+        action="append",
+        default=[],
+        metavar="HOST",
+        help="Talk to registry HOST (e.g. localhost:5000) over plain HTTP (repeatable)",
+    )
+    parser.add_argument(
+        "--os",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Keep only OS variants whose OS tag matches PATTERN, e.g. ubuntu22.04 or "
+             "'rhel9.*' (repeatable)",
+    )
+    parser.add_argument(
+        "--exclude-os",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Drop OS variants whose OS tag matches PATTERN, e.g. 'rhcos*' (repeatable)",
+    )
+    parser.add_argument(
+        "--kernel",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Keep only precompiled driver tags built for a kernel matching PATTERN "
+             "(repeatable)",
+    )
+    parser.add_argument(
+        "--nodes-json",
+        default=None,
+        metavar="PATH",
+        help="Derive --os and --kernel from 'kubectl get nodes -o json' output",
+    )
+    for option, values_path in _VERSION_SPEC_COMPONENTS.items():
+        parser.add_argument(
+            f"--{option}-versions",
+            action="append",
+            default=[],
+            metavar="SPEC[,SPEC…]",
+            help=f"Also list the OS variants of these {values_path} versions: an exact version, "
+                 "a branch (its newest version) or latest:N (newest N per selected branch)",
+        )
+    parser.add_argument(
+        "--platforms",
+        action="append",
+        default=[],
+        metavar="PLATFORM[,PLATFORM…]",
+        help="Inspect each image's manifest list for these platforms (e.g. linux/amd64,arm64): "
+             "flag images missing one, drop images providing none and annotate json/yaml/csv output",
+    )
+    parser.add_argument(
+        "--split-platforms",
+        action="store_true",
+        help="With --platforms, also write one <output>.<os>-<arch>.<ext> per platform",
+    )
+    parser.add_argument(
+        "--resolve-digests",
+        action="store_true",
+        help="Pin every reference to its manifest digest (repo:tag@sha256:…)",
+    )
+    parser.add_argument(
+        "--expand-platforms",
+        action="store_true",
+        help="With --resolve-digests, replace multi-arch indexes by one reference "
+             "per platform manifest",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="HEAD the manifest of every listed image and exit non-zero, with a "
+             "per-reference report, if any is missing or unauthorized",
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="Report the compressed transfer size (total, deduplicated, per component "
+             "and per OS variant) from manifests instead of listing images",
+    )
+    parser.add_argument(
+        "--discover",
+        action="store_true",
+        help="Also scan chart templates and operand manifests for images, add any "
+             "that values.yaml misses and report mismatches",
+    )
+    parser.add_argument(
+        "--discover-path",
+        action="append",
+        default=None,
+        metavar="PATH",
+        help="File or directory to scan with --discover (repeatable; default: the "
+             "chart templates and the operator's assets/ manifests)",
+    )
+    parser.add_argument(
+        "--diff-against",
+        default=None,
+        metavar="PATH",
+        help="Emit only the images added/removed relative to a previous output of this "
+             "script (any --format); in batch mode, a directory of previous outputs",
+    )
+    parser.add_argument(
+        "--diff-against-values",
+        default=None,
+        metavar="PATH",
+        help="Emit only the images added/removed relative to a previous values.yaml",
+    )
+    parser.add_argument(
+        "--diff-against-chart",
+        default=None,
+        metavar="PATH",
+        help="Chart.yaml paired with --diff-against-values (default: --chart)",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        metavar="PATH",
+        help="Write a JSON trace of the run (phase spans, every registry request, "
+             "retries, fallbacks, cache hits) to PATH",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        default=None,
+        metavar="PATH",
+        help="Write run metrics to PATH in Prometheus textfile-collector format",
+    )
+    parser.add_argument(
+        "--layout",
+        default=None,
+        metavar="PATH",
+        help="mirror: OCI image layout directory to write (created if missing; "
+             "re-running resumes and adds to it)",
+    )
+    parser.add_argument(
+        "--listen",
+        default=None,
+        metavar="HOST:PORT",
+        help=f"serve: address to listen on (default: {DEFAULT_LISTEN})",
+    )
+    parser.add_argument(
+        "--overlay-dir",
+        default=None,
+        metavar="PATH",
+        help="serve: directory whose overlay files or directories requests may name "
+             "(overlay=NAME); without it only JSON overlays are accepted",
+    )
+    parser.add_argument(
+        "--overlay",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Values overlay file, or directory of overlay files merged in name order, "
+             "applied on top of --values (repeatable; requires --output-dir)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=None,
+        metavar="PATH",
+        help="Batch mode: write one <overlay-name>.<ext> image list per --overlay into PATH",
+    )
+    args = parser.parse_args(argv)
+    # Outputs written by this run, as (path or None for stdout, text), for the result cache
+    args.result_outputs = []
+    if args.discover_path is None:
+        args.discover_path = [os.path.join(chart_dir, "templates"), os.path.join(repo_root, "assets")]
+    try:
+        _derive_options(args)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.refresh and not args.cache_dir:
+        parser.error("--refresh requires --cache-dir")
+    if args.split_platforms and not args.platforms:
+        parser.error("--split-platforms requires --platforms")
+    if args.split_platforms and not (args.output or args.output_dir):
+        parser.error("--split-platforms requires --output or --output-dir")
+    if args.split_platforms and (args.estimate or args.diff_against or args.diff_against_values):
+        parser.error("--split-platforms cannot be combined with --estimate or diff output")
+    if args.verify and args.skip_registry:
+        parser.error("--verify cannot be combined with --skip-registry")
+    if args.estimate and args.skip_registry:
+        parser.error("--estimate cannot be combined with --skip-registry")
+    if args.estimate and args.format not in ("text", "json", "yaml"):
+        parser.error("--estimate supports --format text, json or yaml")
+    if args.diff_against and args.diff_against_values:
+        parser.error("--diff-against and --diff-against-values are mutually exclusive")
+    if args.diff_against_chart and not args.diff_against_values:
+        parser.error("--diff-against-chart requires --diff-against-values")
+    if args.diff_against and not args.overlay and not os.path.isfile(args.diff_against):
+        parser.error(f"--diff-against: {args.diff_against} is not a file")
+    if args.diff_against and args.overlay and not os.path.isdir(args.diff_against):
+        parser.error(f"--diff-against: {args.diff_against} is not a directory "
+                     "(with --overlay it holds the previous per-overlay lists)")
+    if args.command == "mirror":
+        if not args.layout:
+            parser.error("mirror requires --layout")
+        if args.skip_registry:
+            parser.error("mirror cannot be combined with --skip-registry")
+        if args.output or args.output_dir:
+            parser.error("mirror writes to --layout; --output/--output-dir do not apply")
+        if args.diff_against or args.diff_against_values:
+            parser.error("mirror cannot be combined with --diff-against/--diff-against-values")
+        if args.estimate:
+            parser.error("--estimate lists sizes only; drop it to mirror")
+        if args.verify:
+            parser.error("mirror already fails on images it cannot fetch; drop --verify")
+        return args
+    if args.layout:
+        parser.error("--layout requires the mirror command")
+    if args.command == "serve":
+        if args.output or args.output_dir or args.overlay:
+            parser.error("serve answers over HTTP; --output/--output-dir/--overlay do not apply")
+        if args.diff_against or args.diff_against_values or args.estimate or args.verify:
+            parser.error("serve lists images only; drop --diff-against/--estimate/--verify")
+        if args.split_platforms or args.refresh:
+            parser.error("--split-platforms and --refresh do not apply to serve")
+        if args.overlay_dir and not os.path.isdir(args.overlay_dir):
+            parser.error(f"--overlay-dir: {args.overlay_dir} is not a directory")
+        host, _, port = (args.listen or DEFAULT_LISTEN).rpartition(":")
+        if not port.isdigit():
+            parser.error(f"--listen: expected HOST:PORT, got {args.listen!r}")
+        args.listen_address = (host or "127.0.0.1", int(port))
+        return args
+    if args.listen or args.overlay_dir:
+        parser.error("--listen and --overlay-dir require the serve command")
+    if args.overlay and not args.output_dir:
+        parser.error("--overlay requires --output-dir")
+    if args.output_dir and not args.overlay:
+        parser.error("--output-dir requires at least one --overlay")
+    if args.overlay and args.output:
+        parser.error("--output cannot be combined with --overlay; use --output-dir")
+    return args
+
+
+class _ChartInputs(NamedTuple):
+    """Parsed chart files for one image list: merged values, appVersion and NFD subchart."""
+    values: dict
+    app_version: str
+    nfd_values: dict | None
+    nfd_chart: dict | None
+
+
+def _generate_image_entries(
+    inputs: _ChartInputs,
+    args: argparse.Namespace,
+    client: _RegistryClient,
+    discovered: list[_DiscoveredImage] | None = None,
+) -> list[ImageEntry]:
+    """Return the sorted, de-duplicated image entries for one set of merged values."""
+    values, app_version, nfd_values, nfd_chart = inputs
+    for block in _uncovered_image_blocks(values):
+        print(f"  Warning: values image block '{block}' is not covered by the component "
+              "table; its image is not listed.",
+              file=sys.stderr)
+
+    # Collect GPU Operator component images
+    with client.metrics.span("operator-images"):
+        entries: list[ImageEntry] = _extract_operator_entries(
+            values, app_version, args.skip_registry, args.gpu_operator_version, args.jobs, client,
+            args.os_filter, args.version_specs,
+        )
+
+    # Collect NFD images (from the bundled subchart, with parent-chart overrides)
+    if nfd_values is not None and nfd_chart is not None:
+        nfd_overrides = values.get("node-feature-discovery") or {}
+        with client.metrics.span("nfd-images"):
+            entries += _extract_nfd_entries(_deep_merge(nfd_values, nfd_overrides), nfd_chart)
+
+    # Union with images discovered in chart templates / operand manifests
+    if discovered is not None:
+        with client.metrics.span("reconcile-discovered"):
+            extra_entries, mismatches = _reconcile_discovered_images(
+                discovered, values, [entry.reference for entry in entries]
+            )
+        for mismatch in mismatches:
+            print(f"  Discovery: {mismatch}", file=sys.stderr)
+        entries += extra_entries
+
+    if args.platforms:
+        with client.metrics.span("platforms"):
+            entries = _filter_platforms(entries, client, args.platforms, args.jobs)
+
+    if args.resolve_digests:
+        with client.metrics.span("resolve-digests"):
+            pinned = _pin_digests(
+                sorted({entry.reference for entry in entries}), client, args.jobs,
+                args.expand_platforms, args.platforms,
+            )
+        entries = [
+            entry._replace(reference=pinned_reference)
+            for entry in entries
+            for pinned_reference in pinned[entry.reference]
+        ]
+
+    # Deduplicate and sort
+    return sorted(set(entries))
+
+
+def _format_skopeo_sync(entries: list[ImageEntry]) -> str:
+    """Render entries as a `skopeo sync --src yaml` source file, grouped by registry."""
+    registries: dict[str, dict[str, set[str]]] = {}
+    for entry in entries:
+        registry_host, namespace, tag = _split_ref(entry.reference)
+        _, _, digest = entry.reference.partition("@")
+        registries.setdefault(registry_host, {}).setdefault(namespace, set()).add(digest or tag)
+    document = {
+        registry_host: {
+            "images": {namespace: sorted(refs) for namespace, refs in sorted(repositories.items())}
+        }
+        for registry_host, repositories in sorted(registries.items())
+    }
+    return yaml.safe_dump(document, default_flow_style=False, sort_keys=False)
+
+
+def _format_entries(
+    entries: list[ImageEntry],
+    output_format: str,
+    platforms: dict[str, list[str] | None] | None = None,
+) -> str:
+    """Render image entries in one of OUTPUT_FORMATS.
+
+    With platforms ({reference: requested platforms it provides}), json, yaml
+    and csv entries carry an extra "platforms" field.
+    """
+    def as_dict(entry: ImageEntry) -> dict:
+        item = entry._asdict()
+        if platforms is not None:
+            item["platforms"] = platforms.get(entry.reference)
+        return item
+
+    if output_format == "text":
+        return "\n".join(sorted({entry.reference for entry in entries})) + "\n"
+    if output_format == "json":
+        return json.dumps([as_dict(entry) for entry in entries], indent=2) + "\n"
+    if output_format == "yaml":
+        return yaml.safe_dump(
+            [as_dict(entry) for entry in entries], default_flow_style=False, sort_keys=False
+        )
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if platforms is None:
+            writer.writerow(ImageEntry._fields)
+            writer.writerows(entries)
+        else:
+            writer.writerow((*ImageEntry._fields, "platforms"))
+            writer.writerows(
+                (*entry, " ".join(platforms.get(entry.reference) or [])) for entry in entries
+            )
+        return buffer.getvalue()
+    if output_format == "skopeo-sync":
+        return _format_skopeo_sync(entries)
+    raise ValueError(f"unknown output format {output_format!r}")
+
+
+def _write_output(output_text: str, path: str | None) -> None:
+    if path:
+        with open(path, "w") as file_handle:
+            file_handle.write(output_text)
+    else:
+        sys.stdout.write(output_text)
+
+
+def _write_result(args: argparse.Namespace, output_text: str, path: str | None) -> None:
+    """Write one output of the run and remember it for the result cache."""
+    _write_output(output_text, path)
+    args.result_outputs.append((path, output_text))
+
+
+def _platform_output_path(path: str, platform: str, output_format: str) -> str:
+    """images.txt + linux/arm64 -> images.linux-arm64.txt"""
+    extension = OUTPUT_FORMATS[output_format]
+    if path.endswith(extension):
+        stem = path[:-len(extension)]
+    else:
+        stem, extension = os.path.splitext(path)
+    return f"{stem}.{platform.replace('/', '-')}{extension}"
+
+
+def _write_platform_outputs(
+    args: argparse.Namespace,
+    entries: list[ImageEntry],
+    client: _RegistryClient,
+    path: str,
+) -> None:
+    """--split-platforms: write one output per requested platform next to path.
+
+    Images whose platforms could not be inspected go into every file.
+    """
+    annotations = _platform_annotations(entries, client, args.platforms, args.jobs)
+    for platform in args.platforms:
+        platform_entries = [
+            entry for entry in entries
+            if annotations.get(entry.reference) is None or platform in annotations[entry.reference]
+        ]
+        platform_path = _platform_output_path(path, platform, args.format)
+        _write_result(args, _format_entries(platform_entries, args.format, annotations), platform_path)
+        image_count = len({entry.reference for entry in platform_entries})
+        print(f"Wrote {image_count} {platform} images to {platform_path}", file=sys.stderr)
+
+
+def _overlay_output_name(overlay_path: str, output_format: str = "text") -> str:
+    base_name = os.path.basename(os.path.normpath(overlay_path))
+    if not os.path.isdir(overlay_path):
+        base_name = os.path.splitext(base_name)[0]
+    return f"{base_name}{OUTPUT_FORMATS[output_format]}"
+
+
+def _load_chart_inputs(values_path: str, chart_path: str, args: argparse.Namespace) -> _ChartInputs:
+    """Load values.yaml, Chart.yaml and (unless --no-nfd) the bundled NFD subchart."""
+    values = _load_yaml(values_path)
+    chart = _load_yaml(chart_path)
+
+    # Resolve the operator appVersion
+    app_version = (chart.get("appVersion") or "").strip()
+    if not app_version:
+        raise _InputError(f"Could not determine appVersion from {chart_path}. "
+                          "Ensure Chart.yaml contains an appVersion field.")
+
+    # Load the bundled NFD subchart
+    nfd_values = nfd_chart = None
+    if not args.no_nfd:
+        try:
+            nfd_values = _load_yaml(args.nfd_values)
+            nfd_chart = _load_yaml(args.nfd_chart)
+        except FileNotFoundError as exc:
+            nfd_values = nfd_chart = None
+            print(f"Warning: NFD chart not found ({exc}); skipping NFD images. "
+                  "Run 'helm dependency update deployments/gpu-operator' to fetch it, "
+                  "or pass --no-nfd to suppress this warning.",
+                  file=sys.stderr)
+
+    return _ChartInputs(values, app_version, nfd_values, nfd_chart)
+
+
+def _write_metrics(metrics: _Metrics, args: argparse.Namespace) -> None:
+    """Write the --trace JSON and --metrics-out Prometheus textfile, if requested."""
+    if args.trace:
+        _write_output(json.dumps(metrics.to_json(), indent=2) + "\n", args.trace)
+    if args.metrics_out:
+        # The textfile collector may read at any time; never expose a partial file
+        _write_atomic(args.metrics_out, metrics.to_prometheus().encode())
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the generate-image-list.py command line with argv (default: sys.argv[1:])."""
+    args = _parse_args(argv)
+    if args.command == "serve":
+        _serve(args)
+        return
+    metrics = _Metrics()
+    try:
+        _main(args, metrics)
+    except _InputError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        # Also written when the run fails, which is when the trace matters most
+        _write_metrics(metrics, args)
+
+
+def _main(args: argparse.Namespace, metrics: _Metrics) -> None:
+    tag_cache = _TagCache(args.cache_dir, args.cache_ttl, args.offline)
+
+    # mirror and --verify act on the registry every time; anything else may be replayed
+    result_cache = fingerprint = None
+    if args.cache_dir and args.command == "list" and not args.verify:
+        result_cache = _ResultCache(tag_cache)
+        with metrics.span("result-cache"):
+            fingerprint = result_cache.fingerprint(args)
+            if args.refresh:
+                entry, reasons = None, ["--refresh"]
+            else:
+                entry, reasons = result_cache.lookup(args, fingerprint)
+        if entry is not None:
+            result_cache.replay(entry)
+            metrics.count("cache_hits", kind="result")
+            created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry["created_at"]))
+            print(f"  Result cache: inputs unchanged since {created_at}; reused "
+                  f"{len(entry['outputs'])} output(s) (--refresh recomputes).",
+                  file=sys.stderr)
+            return
+        print(f"  Result cache: recomputing ({'; '.join(reasons)}).", file=sys.stderr)
+
+    # Load primary chart files
+    with metrics.span("load-charts"):
+        inputs = _load_chart_inputs(args.values, args.chart, args)
+        previous_inputs = None
+        if args.diff_against_values:
+            previous_inputs = _load_chart_inputs(
+                args.diff_against_values, args.diff_against_chart or args.chart, args
+            )
+
+    client = _RegistryClient(
+        tag_cache,
+        retries=args.retries,
+        backoff=args.retry_backoff,
+        plain_http_hosts=args.insecure_registry,
+        metrics=metrics,
+    )
+    # Scan chart templates and operand manifests once, shared by every overlay
+    discovered = None
+    if args.discover:
+        with metrics.span("scan-manifests"):
+            discovered = _scan_manifest_images(args.discover_path)
+
+    with client:
+        _run(args, inputs, client, discovered, previous_inputs)
+
+    if result_cache is not None:
+        failures = metrics.total("lookup_failures")
+        if failures:
+            # A degraded output (fallback tags, unpinned digests) must not be replayed
+            print(f"  Result cache: not storing this run ({failures:g} registry lookups failed).",
+                  file=sys.stderr)
+        else:
+            result_cache.store(args, fingerprint, args.result_outputs)
+
+
+def _render(
+    args: argparse.Namespace,
+    entries: list[ImageEntry],
+    client: _RegistryClient,
+    discovered: list[_DiscoveredImage] | None,
+    previous_inputs: _ChartInputs | None,
+    previous_output: str | None,
+) -> str:
+    """Render entries, or their delta against the previous release when diffing.
+
+    With --estimate a transfer size report is rendered instead (for the added
+    images only when diffing).
+    """
+    if previous_inputs is not None:
+        with client.metrics.span("previous-images"):
+            previous_entries = _generate_image_entries(previous_inputs, args, client, discovered)
+    elif previous_output is not None:
+        previous_entries = _load_previous_entries(previous_output) if os.path.exists(previous_output) else []
+    elif args.estimate:
+        with client.metrics.span("estimate"):
+            return _format_estimate(_estimate_transfer(entries, client, args.jobs), args.format)
+    elif args.platforms:
+        annotations = _platform_annotations(entries, client, args.platforms, args.jobs)
+        return _format_entries(entries, args.format, annotations)
+    else:
+        return _format_entries(entries, args.format)
+    added, removed = _diff_entries(previous_entries, entries)
+    print(f"  Diff: {len({e.reference for e in added})} added, "
+          f"{len({e.reference for e in removed})} removed",
+          file=sys.stderr)
+    if args.estimate:
+        # Only the added images need to be transferred
+        with client.metrics.span("estimate"):
+            return _format_estimate(_estimate_transfer(added, client, args.jobs), args.format)
+    return _format_diff(added, removed, args.format)
+
+
+def _run(
+    args: argparse.Namespace,
+    inputs: _ChartInputs,
+    client: _RegistryClient,
+    discovered: list[_DiscoveredImage] | None = None,
+    previous_inputs: _ChartInputs | None = None,
+) -> None:
+    if args.command == "mirror":
+        _run_mirror(args, inputs, client, discovered)
+        return
+
+    if not args.overlay:
+        entries = _generate_image_entries(inputs, args, client, discovered)
+        output_text = _render(args, entries, client, discovered, previous_inputs, args.diff_against)
+        _write_result(args, output_text, args.output)
+        if args.split_platforms:
+            _write_platform_outputs(args, entries, client, args.output)
+        if args.verify:
+            _verify_or_exit(args, entries, client)
+        return
+
+    # Batch mode: one image list per overlay, sharing parsed charts and tag lists
+    output_names: dict[str, str] = {}
+    for overlay_path in args.overlay:
+        output_name = _overlay_output_name(overlay_path, args.format)
+        if output_name in output_names:
+            print(f"Error: overlays {output_names[output_name]} and {overlay_path} "
+                  f"would both write {output_name}.",
+                  file=sys.stderr)
+            sys.exit(1)
+        output_names[output_name] = overlay_path
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    all_entries: list[ImageEntry] = []
+    for output_name, overlay_path in output_names.items():
+        overlay = _load_overlay(overlay_path)
+        entries = _generate_image_entries(
+            inputs._replace(values=_deep_merge(inputs.values, overlay)), args, client, discovered
+        )
+        previous_overlay_inputs = None
+        if previous_inputs is not None:
+            previous_overlay_inputs = previous_inputs._replace(
+                values=_deep_merge(previous_inputs.values, overlay)
+            )
+        # With --diff-against DIR, each overlay is compared with DIR/<output-name>
+        previous_output = os.path.join(args.diff_against, output_name) if args.diff_against else None
+        if previous_output and not os.path.isfile(previous_output):
+            print(f"  Warning: {previous_output} not found; every image of {overlay_path} "
+                  "will be reported as added.",
+                  file=sys.stderr)
+        output_text = _render(
+            args, entries, client, discovered, previous_overlay_inputs, previous_output
+        )
+        _write_result(args, output_text, os.path.join(args.output_dir, output_name))
+        if args.split_platforms:
+            _write_platform_outputs(args, entries, client, os.path.join(args.output_dir, output_name))
+        image_count = len({entry.reference for entry in entries})
+        print(f"Wrote {image_count} images for {overlay_path} to {output_name}", file=sys.stderr)
+        all_entries += entries
+
+    if args.verify:
+        _verify_or_exit(args, all_entries, client)
+
+
+def _verify_or_exit(
+    args: argparse.Namespace,
+    entries: list[ImageEntry],
+    client: _RegistryClient,
+) -> None:
+    """--verify: HEAD every listed reference and exit 1 if any is missing or unauthorized."""
+    with client.metrics.span("verify"):
+        results = _verify_references(sorted({entry.reference for entry in entries}), client, args.jobs)
+    if not _report_verification(results):
+        sys.exit(1)
+
+
+def _run_mirror(
+    args: argparse.Namespace,
+    inputs: _ChartInputs,
+    client: _RegistryClient,
+    discovered: list[_DiscoveredImage] | None = None,
+) -> None:
+    """Mirror every listed image (the union across overlays) into args.layout."""
+    images: set[str] = set()
+    for overlay_path in args.overlay or [None]:
+        overlay_inputs = inputs
+        if overlay_path is not None:
+            overlay_inputs = inputs._replace(
+                values=_deep_merge(inputs.values, _load_overlay(overlay_path))
+            )
+        entries = _generate_image_entries(overlay_inputs, args, client, discovered)
+        images.update(entry.reference for entry in entries)
+
+    with client.metrics.span("mirror"):
+        result = _mirror_images(sorted(images), args.layout, client, args.jobs)
+    print(f"Mirrored {result.images} images ({result.blobs} blobs, {result.reused_blobs} "
+          f"already present, {result.bytes_fetched} bytes downloaded) to {args.layout}",
+          file=sys.stderr)
+    if result.failed:
+        print(f"Error: {len(result.failed)} images could not be mirrored:", file=sys.stderr)
+        for image_reference in result.failed:
+            print(f"  {image_reference}", file=sys.stderr)
+        sys.exit(1)
+
+
+__all__ = [
+    "OUTPUT_FORMATS",
+    "ImageEntry",
+    "ImageList",
+    "ImageListGenerator",
+    "generate_image_list",
+    "generate_image_list_async",
+    "main",
+]
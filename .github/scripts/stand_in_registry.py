@@ -0,0 +1,251 @@
+# Copyright NVIDIA CORPORATION
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process Docker Registry v2 stand-in shared by the image_list tests and benchmark.
+
+It serves the nvcr.io-style token realm (/proxy_auth), paginated tags/list with
+relative Link headers, manifest HEAD/GET and blob GET with Range requests on a
+local plain-HTTP port, so the generator can be pointed at it with
+--insecure-registry.
+"""
+
+import bisect
+import hashlib
+import http.client
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from typing import NamedTuple
+
+MANIFEST_MEDIA_TYPE = "application/vnd.oci.image.manifest.v1+json"
+_CONFIG_MEDIA_TYPE = "application/vnd.oci.image.config.v1+json"
+_LAYER_MEDIA_TYPE = "application/vnd.oci.image.layer.v1.tar+gzip"
+_TOKEN = "stand-in"
+
+
+def digest(data: bytes) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+class RegistryRequest(NamedTuple):
+    method: str
+    path: str
+    headers: http.client.HTTPMessage
+
+
+class StandInRegistry:
+    """Docker Registry v2 stand-in listening on 127.0.0.1.
+
+    tags maps a namespace to its sorted tag list.  Images published with
+    add_image() have real manifests and blobs; any other listed tag is answered
+    with a generated manifest whose layers (a few shared base layers and one of
+    its own) exist only as descriptors, which is enough to resolve digests and
+    estimate sizes.
+
+    Faults can be injected: latency delays every response, fail_statuses are
+    returned, in order, instead of the next responses, truncate_at cuts every
+    blob body after that many bytes and drops the connection, and without
+    issue_tokens the realm answers {}.  With etags, tags/list pages carry an
+    ETag and a matching If-None-Match is answered with 304 Not Modified.  Every
+    request is logged in requests and counted by kind (challenge, token, tags,
+    manifest, blob, other) in counts.
+    """
+
+    def __init__(self, latency: float = 0.0, page_size: int = 100):
+        self.latency = latency
+        self.page_size = page_size
+        self.tags: dict[str, list[str]] = {}
+        self.manifests: dict[tuple[str, str], bytes] = {}
+        self.blobs: dict[str, bytes] = {}
+        self.fail_statuses: list[int] = []
+        self.truncate_at: int | None = None
+        self.issue_tokens = True
+        self.etags = False
+        self.requests: list[RegistryRequest] = []
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.host = f"127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def __enter__(self) -> "StandInRegistry":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.counts.clear()
+
+    def requests_to(self, fragment: str) -> list[RegistryRequest]:
+        """The logged requests whose path contains fragment."""
+        with self._lock:
+            return [request for request in self.requests if fragment in request.path]
+
+    def add_image(self, namespace: str, tag: str, layer: bytes = b"layer") -> str:
+        """Publish a single-platform image with real blobs; return its manifest digest."""
+        config = json.dumps({"os": "linux", "architecture": "amd64"}).encode()
+        manifest = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": MANIFEST_MEDIA_TYPE,
+            "config": {"mediaType": _CONFIG_MEDIA_TYPE, "digest": digest(config), "size": len(config)},
+            "layers": [{"mediaType": _LAYER_MEDIA_TYPE, "digest": digest(layer), "size": len(layer)}],
+        }).encode()
+        with self._lock:
+            self.blobs[digest(config)] = config
+            self.blobs[digest(layer)] = layer
+            self.manifests[(namespace, tag)] = manifest
+            self.manifests[(namespace, digest(manifest))] = manifest
+            tags = self.tags.setdefault(namespace, [])
+            if tag not in tags:
+                bisect.insort(tags, tag)
+        return digest(manifest)
+
+    def _manifest(self, namespace: str, reference: str) -> bytes | None:
+        with self._lock:
+            body = self.manifests.get((namespace, reference))
+        if body is not None or reference.startswith("sha256:"):
+            return body
+        if reference not in self.tags.get(namespace, ()):
+            return None
+
+        def descriptor(media_type: str, seed: str, size: int) -> dict:
+            return {"mediaType": media_type, "digest": digest(seed.encode()), "size": size}
+
+        body = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": MANIFEST_MEDIA_TYPE,
+            "config": descriptor(_CONFIG_MEDIA_TYPE, f"config {namespace}:{reference}", 4096),
+            "layers": [
+                descriptor(_LAYER_MEDIA_TYPE, "base 0", 30 << 20),
+                descriptor(_LAYER_MEDIA_TYPE, "base 1", 80 << 20),
+                descriptor(_LAYER_MEDIA_TYPE, f"layer {namespace}:{reference}", 50 << 20),
+            ],
+        }).encode()
+        with self._lock:
+            self.manifests[(namespace, digest(body))] = body
+        return body
+
+    def _handler(self):
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without TCP_NODELAY every
+            # keep-alive response would wait for a delayed ACK.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes = b"", headers: dict | None = None,
+                      truncate_at: int | None = None) -> None:
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command == "HEAD":
+                    return
+                if truncate_at is not None and truncate_at < len(body):
+                    self.wfile.write(body[:truncate_at])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def _count(self, kind: str) -> None:
+                with registry._lock:
+                    registry.counts[kind] += 1
+
+            def do_HEAD(self) -> None:
+                self.do_GET()
+
+            def do_GET(self) -> None:
+                if registry.latency:
+                    time.sleep(registry.latency)
+                url = urllib.parse.urlsplit(self.path)
+                query = urllib.parse.parse_qs(url.query)
+                with registry._lock:
+                    registry.requests.append(RegistryRequest(self.command, self.path, self.headers))
+                    status = registry.fail_statuses.pop(0) if registry.fail_statuses else None
+                if status is not None:
+                    return self._send(status, b"", {"Retry-After": "0"})
+
+                if url.path == "/proxy_auth":
+                    self._count("token")
+                    token = {"token": _TOKEN, "expires_in": 300} if registry.issue_tokens else {}
+                    return self._send(200, json.dumps(token).encode(),
+                                      {"Content-Type": "application/json"})
+                if self.headers.get("Authorization") != f"Bearer {_TOKEN}":
+                    self._count("challenge")
+                    realm = f'Bearer realm="http://{registry.host}/proxy_auth",service="stand-in"'
+                    return self._send(401, b"", {"WWW-Authenticate": realm})
+
+                path = url.path[len("/v2/"):]
+                if path.endswith("/tags/list"):
+                    self._count("tags")
+                    namespace = path[:-len("/tags/list")]
+                    tags = registry.tags.get(namespace)
+                    if tags is None:
+                        return self._send(404)
+                    page_size = min(int(query.get("n", [registry.page_size])[0]), registry.page_size)
+                    last = query.get("last", [None])[0]
+                    start = tags.index(last) + 1 if last else 0
+                    chunk = tags[start:start + page_size]
+                    headers = {"Content-Type": "application/json"}
+                    if start + page_size < len(tags):
+                        next_url = f"/v2/{namespace}/tags/list?n={page_size}&last={chunk[-1]}"
+                        headers["Link"] = f'<{next_url}>; rel="next"'
+                    body = json.dumps({"name": namespace, "tags": chunk}).encode()
+                    if registry.etags:
+                        headers["ETag"] = f'"{digest(body)}"'
+                        if self.headers.get("If-None-Match") == headers["ETag"]:
+                            return self._send(304, b"", headers)
+                    return self._send(200, body, headers)
+                if "/manifests/" in path:
+                    self._count("manifest")
+                    namespace, reference = path.split("/manifests/", 1)
+                    body = registry._manifest(namespace, reference)
+                    if body is None:
+                        return self._send(404)
+                    return self._send(200, body, {"Content-Type": MANIFEST_MEDIA_TYPE,
+                                                  "Docker-Content-Digest": digest(body)})
+                if "/blobs/" in path:
+                    self._count("blob")
+                    body = registry.blobs.get(path.split("/blobs/", 1)[1])
+                    if body is None:
+                        return self._send(404)
+                    byte_range = self.headers.get("Range")
+                    if byte_range:
+                        start = int(byte_range[len("bytes="):].split("-")[0])
+                        if start >= len(body):
+                            return self._send(416)
+                        return self._send(206, body[start:], {
+                            "Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}",
+                        }, registry.truncate_at)
+                    return self._send(200, body, {}, registry.truncate_at)
+                self._count("other")
+                return self._send(404)
+
+        return Handler
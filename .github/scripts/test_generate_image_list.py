@@ -0,0 +1,693 @@
+# Copyright NVIDIA CORPORATION
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for image_list (generate-image-list.py) against an in-process stand-in registry.
+
+Run with: python3 -m pytest .github/scripts
+"""
+
+import base64
+import http.client
+import http.server
+import json
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+import image_list
+from stand_in_registry import StandInRegistry, digest
+
+
+@pytest.fixture
+def registry():
+    stand_in = StandInRegistry()
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture(autouse=True)
+def _no_proxy_environment(monkeypatch):
+    """Keep the caller's proxy settings away from the stand-in registry."""
+    for name in ("http_proxy", "https_proxy", "all_proxy", "no_proxy"):
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+
+
+class _ForwardingProxy:
+    """Plain-HTTP forward proxy on 127.0.0.1 that logs (method, URL, Proxy-Authorization)."""
+
+    def __init__(self):
+        self.requests: list[tuple[str, str, str | None]] = []
+        proxy = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                proxy.requests.append((self.command, self.path, self.headers.get("Proxy-Authorization")))
+                target = urllib.parse.urlsplit(self.path)
+                headers = {key: value for key, value in self.headers.items()
+                           if key.lower() not in ("host", "connection", "proxy-authorization")}
+                upstream = http.client.HTTPConnection(target.netloc, timeout=10)
+                try:
+                    path = target.path + (f"?{target.query}" if target.query else "")
+                    upstream.request(self.command, path, headers=headers)
+                    response = upstream.getresponse()
+                    body = response.read()
+                finally:
+                    upstream.close()
+                self.send_response(response.status, response.reason)
+                for key, value in response.getheaders():
+                    if key.lower() not in ("connection", "content-length", "transfer-encoding"):
+                        self.send_header(key, value)
+                self.send_header("Content-Length", response.getheader("Content-Length") or str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_HEAD = do_GET
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.host = f"127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def proxy():
+    forwarding_proxy = _ForwardingProxy()
+    yield forwarding_proxy
+    forwarding_proxy.close()
+
+
+def _client(registry: StandInRegistry, **kwargs):
+    kwargs.setdefault("backoff", 0)
+    return image_list._RegistryClient(plain_http_hosts=[registry.host], **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Mirror
+# ---------------------------------------------------------------------------
+
+def test_mirror_resumes_blob_after_dropped_connection(registry, tmp_path):
+    layer = os.urandom(300_000)
+    registry.add_image("nvidia/driver", "595.58.03-ubuntu22.04", layer)
+    registry.truncate_at = 100_000
+    image = f"{registry.host}/nvidia/driver:595.58.03-ubuntu22.04"
+
+    with _client(registry, retries=3) as client:
+        result = image_list._mirror_images([image], str(tmp_path / "layout"), client, 2)
+
+    assert result.failed == []
+    ranges = [request.headers["Range"] for request in registry.requests_to(digest(layer))
+              if request.headers.get("Range")]
+    assert ranges == ["bytes=100000-", "bytes=200000-"]
+    layout = image_list._OCILayout(str(tmp_path / "layout"))
+    with open(layout.blob_path(digest(layer)), "rb") as file_handle:
+        assert file_handle.read() == layer
+    assert os.listdir(tmp_path / "layout" / ".partial") == []
+
+
+def test_mirror_keeps_partial_when_retries_run_out(registry, tmp_path):
+    layer = os.urandom(300_000)
+    registry.add_image("nvidia/driver", "595.58.03-ubuntu22.04", layer)
+    registry.truncate_at = 100_000
+    image = f"{registry.host}/nvidia/driver:595.58.03-ubuntu22.04"
+
+    with _client(registry, retries=0) as client:
+        result = image_list._mirror_images([image], str(tmp_path / "layout"), client, 2)
+    assert result.failed == [image]
+    layout = image_list._OCILayout(str(tmp_path / "layout"))
+    assert os.path.getsize(layout.partial_path(digest(layer))) == 100_000
+
+    # The next run resumes where the previous one stopped
+    registry.truncate_at = None
+    with _client(registry, retries=0) as client:
+        result = image_list._mirror_images([image], str(tmp_path / "layout"), client, 2)
+    assert result.failed == []
+    assert registry.requests_to(digest(layer))[-1].headers["Range"] == "bytes=100000-"
+
+
+# ---------------------------------------------------------------------------
+# Verification
+# ---------------------------------------------------------------------------
+
+def test_verify_reuses_manifests_resolved_by_tag(registry):
+    images = []
+    for tag in ("1.0", "2.0", "3.0"):
+        registry.add_image("nvidia/gpu-operator", tag, tag.encode())
+        images.append(f"{registry.host}/nvidia/gpu-operator:{tag}")
+
+    with _client(registry) as client:
+        pinned = image_list._pin_digests(images, client)
+        manifest_requests = len(registry.requests_to("/manifests/"))
+        results = image_list._verify_references([ref for refs in pinned.values() for ref in refs], client)
+
+    assert set(results.values()) == {"ok"}
+    assert len(registry.requests_to("/manifests/")) == manifest_requests
+
+
+def test_verify_reports_missing_and_unauthorized(registry):
+    registry.add_image("nvidia/gpu-operator", "1.0")
+    present = f"{registry.host}/nvidia/gpu-operator:1.0"
+    absent = f"{registry.host}/nvidia/gpu-operator:9.9"
+
+    with _client(registry) as client:
+        assert image_list._verify_references([present, absent], client) == {present: "ok", absent: "missing"}
+
+    registry.issue_tokens = False
+    with _client(registry) as client:
+        assert image_list._verify_references([present], client, 1) == {present: "unauthorized"}
+
+
+# ---------------------------------------------------------------------------
+# Registry client
+# ---------------------------------------------------------------------------
+
+def test_client_follows_tag_pagination_with_one_token(registry):
+    registry.page_size = 3
+    for index in range(8):
+        registry.add_image("nvidia/driver", f"595.58.03-os{index}")
+
+    with _client(registry) as client:
+        tags = client.fetch_all_tags(registry.host, "nvidia/driver")
+        assert client.fetch_all_tags(registry.host, "nvidia/driver") == tags
+
+    assert sorted(tags) == sorted(registry.tags["nvidia/driver"])
+    assert len(registry.requests_to("/tags/list")) == 3
+    assert registry.counts["token"] == 1
+
+
+def test_client_token_covers_hinted_namespaces(registry):
+    registry.add_image("nvidia/driver", "1.0")
+    registry.add_image("nvidia/cloud-native/gdrdrv", "1.0")
+
+    with _client(registry) as client:
+        client.add_scope_hints(registry.host, ["nvidia/driver", "nvidia/cloud-native/gdrdrv"])
+        client.fetch_all_tags(registry.host, "nvidia/driver")
+        client.fetch_all_tags(registry.host, "nvidia/cloud-native/gdrdrv")
+
+    assert registry.counts["token"] == 1
+    token_path = registry.requests_to("/proxy_auth")[0].path
+    scopes = urllib.parse.parse_qs(urllib.parse.urlsplit(token_path).query)
+    assert sorted(scopes["scope"]) == [
+        "repository:nvidia/cloud-native/gdrdrv:pull", "repository:nvidia/driver:pull",
+    ]
+
+
+def test_client_goes_through_environment_proxy(registry, proxy, monkeypatch):
+    registry.add_image("nvidia/driver", "1.0")
+    monkeypatch.setenv("http_proxy", f"http://builder:s%40cret@{proxy.host}")
+
+    with _client(registry) as client:
+        assert client.fetch_all_tags(registry.host, "nvidia/driver") == ["1.0"]
+
+    assert proxy.requests and len(proxy.requests) == len(registry.requests)
+    assert all(url.startswith(f"http://{registry.host}/") for _, url, _ in proxy.requests)
+    assert {authorization for _, _, authorization in proxy.requests} == {
+        "Basic " + base64.b64encode(b"builder:s@cret").decode()
+    }
+
+    proxy.requests.clear()
+    monkeypatch.setenv("no_proxy", "localhost,127.0.0.1")
+    with _client(registry) as client:
+        assert client.fetch_all_tags(registry.host, "nvidia/driver") == ["1.0"]
+    assert proxy.requests == []
+
+
+def test_client_tunnels_https_through_proxy():
+    proxies = {"https": "http://proxy.example:3128", "no": "internal.example"}
+    with image_list._RegistryClient(proxies=proxies) as client:
+        tunneled, _ = client._acquire("https", "nvcr.io")
+        direct, _ = client._acquire("https", "registry.internal.example")
+
+    assert (tunneled.host, tunneled.port, tunneled._tunnel_host) == ("proxy.example", 3128, "nvcr.io")
+    assert (direct.host, direct._tunnel_host) == ("registry.internal.example", None)
+
+
+def _cache_hits(client, kind: str) -> float:
+    return client.metrics.counters.get(("cache_hits", (("kind", kind),)), 0)
+
+
+def test_tag_cache_serves_fresh_entries_and_revalidates_stale_pages(registry, tmp_path):
+    registry.etags = True
+    registry.page_size = 2
+    for os_tag in ("rhel9.4", "rocky9", "ubuntu22.04", "ubuntu24.04"):
+        registry.add_image("nvidia/driver", f"595.58.03-{os_tag}")
+    cache_dir = str(tmp_path / "cache")
+
+    with _client(registry, tag_cache=image_list._TagCache(cache_dir)) as client:
+        tags = client.fetch_all_tags(registry.host, "nvidia/driver")
+    assert registry.counts["tags"] == 2
+
+    registry.reset_counters()
+    with _client(registry, tag_cache=image_list._TagCache(cache_dir)) as client:
+        assert client.fetch_all_tags(registry.host, "nvidia/driver") == tags
+        assert _cache_hits(client, "tags-fresh") == 1
+    assert registry.counts["tags"] == 0
+
+    # Once stale, unchanged pages come back as 304 and only the changed one is sent again
+    registry.add_image("nvidia/driver", "595.58.03-ubuntu26.04")
+    registry.reset_counters()
+    with _client(registry, tag_cache=image_list._TagCache(cache_dir, ttl=0)) as client:
+        refreshed = client.fetch_all_tags(registry.host, "nvidia/driver")
+        assert _cache_hits(client, "tag-page-not-modified") == 2
+    assert refreshed == [*tags, "595.58.03-ubuntu26.04"]
+    assert [request.headers.get("If-None-Match") is not None
+            for request in registry.requests_to("/tags/list")] == [True, True, False]
+
+
+def test_tag_cache_offline_serves_stale_entries(registry, tmp_path):
+    registry.add_image("nvidia/driver", "595.58.03-ubuntu22.04")
+    cache_dir = str(tmp_path / "cache")
+    with _client(registry, tag_cache=image_list._TagCache(cache_dir)) as client:
+        client.fetch_all_tags(registry.host, "nvidia/driver")
+
+    registry.reset_counters()
+    with _client(registry, tag_cache=image_list._TagCache(cache_dir, ttl=0, offline=True)) as client:
+        assert client.fetch_all_tags(registry.host, "nvidia/driver") == ["595.58.03-ubuntu22.04"]
+        assert _cache_hits(client, "tags-offline") == 1
+        with pytest.raises(RuntimeError, match="offline and no cached tags"):
+            client.fetch_all_tags(registry.host, "nvidia/gdrdrv")
+    assert registry.requests == []
+
+
+def test_client_retries_retryable_statuses(registry):
+    registry.add_image("nvidia/driver", "1.0")
+
+    with _client(registry, retries=2) as client:
+        client.token(registry.host, "nvidia/driver")
+        registry.fail_statuses = [503, 429]
+        assert client.fetch_all_tags(registry.host, "nvidia/driver") == ["1.0"]
+        retries = client.metrics.total("retries")
+    assert retries == 2
+
+
+def test_client_gives_up_after_retries(registry):
+    registry.add_image("nvidia/driver", "1.0")
+
+    with _client(registry, retries=1) as client, pytest.raises(image_list._RegistryHTTPError) as excinfo:
+        client.token(registry.host, "nvidia/driver")
+        registry.fail_statuses = [503, 503]
+        client.fetch_all_tags(registry.host, "nvidia/driver")
+    assert excinfo.value.status == 503
+
+
+def test_os_variant_tags_expand_filter_and_fall_back(registry):
+    for tag in ("595.58.03-ubuntu22.04", "595.58.03-rhel9.4", "595.58.03-ubuntu22.04.sbom",
+                "sha256-0123.sig", "580.95.05-ubuntu22.04"):
+        registry.add_image("nvidia/driver", tag)
+    repository = f"{registry.host}/nvidia/driver"
+    fallback = f"{repository}:595.58.03"
+
+    with _client(registry) as client:
+        variants = image_list._os_variant_tags(
+            registry.host, "nvidia/driver", "595.58.03", fallback, False, client
+        )
+        filtered = image_list._os_variant_tags(
+            registry.host, "nvidia/driver", "595.58.03", fallback, False, client,
+            image_list._OSFilter(exclude=["rhel*"]),
+        )
+        missing = image_list._os_variant_tags(
+            registry.host, "nvidia/driver", "999.0", f"{repository}:999.0", False, client
+        )
+        fallbacks = client.metrics.total("fallbacks")
+
+    assert variants == [f"{repository}:595.58.03-rhel9.4", f"{repository}:595.58.03-ubuntu22.04"]
+    assert filtered == [f"{repository}:595.58.03-ubuntu22.04"]
+    assert missing == [f"{repository}:999.0"]
+    assert fallbacks == 1
+
+
+def test_os_variant_tags_fall_back_when_registry_fails(registry):
+    fallback = f"{registry.host}/nvidia/driver:595.58.03"
+    with _client(registry, retries=0) as client:
+        assert image_list._os_variant_tags(
+            registry.host, "nvidia/driver", "595.58.03", fallback, False, client
+        ) == [fallback]
+        assert client.metrics.total("lookup_failures") == 1
+    assert image_list._os_variant_tags("nvcr.io", "nvidia/driver", "595.58.03", fallback, True) == [fallback]
+
+
+def test_os_variant_tags_without_fallback_skip(registry, capsys):
+    registry.add_image("nvidia/driver", "595.58.03-ubuntu22.04")
+    with _client(registry) as client:
+        assert image_list._os_variant_tags(
+            registry.host, "nvidia/driver", "999.0", "", False, client
+        ) == []
+        assert client.metrics.total("fallbacks") == 0
+    err = capsys.readouterr().err
+    assert "999.0-* in" in err and "skipping" in err and "fallback" not in err
+
+
+# ---------------------------------------------------------------------------
+# Values, OS tags and versions
+# ---------------------------------------------------------------------------
+
+def test_deep_merge_follows_helm_semantics():
+    base = {"driver": {"enabled": True, "version": "1", "env": [{"name": "A"}]}, "gds": {"enabled": False}}
+    overlay = {"driver": {"version": "2", "env": [{"name": "B"}]}, "gds": None, "new": {"x": 1}}
+
+    merged = image_list._deep_merge(base, overlay)
+
+    assert merged == {"driver": {"enabled": True, "version": "2", "env": [{"name": "B"}]}, "new": {"x": 1}}
+    assert base["driver"]["version"] == "1" and "gds" in base
+
+
+def test_overlay_directory_keeps_nulls(tmp_path):
+    (tmp_path / "10-base.yaml").write_text(
+        "gds: null\ndriver:\n  manager:\n    version: v1\ngdrcopy: null\n"
+    )
+    (tmp_path / "20-site.yaml").write_text(
+        "driver:\n  manager: null\ngdrcopy:\n  enabled: true\n"
+    )
+    values = {
+        "gds": {"enabled": False},
+        "gdrcopy": {"enabled": False, "version": "v2.5"},
+        "driver": {"version": "595.58.03", "manager": {"version": "v0"}},
+    }
+
+    merged = image_list._deep_merge(values, image_list._load_overlay(str(tmp_path)))
+
+    # As with helm -f 10-base.yaml -f 20-site.yaml
+    assert merged == {
+        "gdrcopy": {"enabled": True, "version": "v2.5"},
+        "driver": {"version": "595.58.03"},
+    }
+
+
+@pytest.mark.parametrize("suffix, expected", [
+    ("ubuntu22.04", (None, "ubuntu22.04")),
+    ("rhel9.4", (None, "rhel9.4")),
+    ("rocky9", (None, "rocky9")),
+    ("5.15.0-1065-nvidia-ubuntu22.04", ("5.15.0-1065-nvidia", "ubuntu22.04")),
+    ("6.8.0-1008-aws-ubuntu24.04", ("6.8.0-1008-aws", "ubuntu24.04")),
+    ("not-an-os", (None, None)),
+])
+def test_split_os_suffix(suffix, expected):
+    assert image_list._split_os_suffix(suffix) == expected
+
+
+_DRIVER_TAGS = [
+    f"{version}-ubuntu22.04"
+    for version in ("595.58.03", "595.45.01", "580.95.05", "580.82.07", "570.172.08", "570.158.01")
+]
+
+
+@pytest.mark.parametrize("specs, expected", [
+    (["580.82.07"], ["580.82.07"]),
+    (["580"], ["580.95.05"]),
+    (["latest:2"], ["595.45.01"]),
+    (["580", "latest:2"], ["595.45.01", "580.95.05", "580.82.07"]),
+    (["600"], []),
+])
+def test_select_versions(specs, expected):
+    assert image_list._select_versions(specs, "595.58.03", image_list._TagIndex(_DRIVER_TAGS)) == expected
+
+
+def test_select_versions_ignores_unpublished_exact_versions(capsys):
+    index = image_list._TagIndex(_DRIVER_TAGS)
+    assert image_list._select_versions(["999.1.1", "580.82.07"], "595.58.03", index) == ["580.82.07"]
+    assert "ignoring 999.1.1" in capsys.readouterr().err
+
+
+def test_select_versions_precompiled_branches():
+    tags = ["595-5.15.0-1065-nvidia-ubuntu22.04", "580-5.15.0-1065-nvidia-ubuntu22.04",
+            "570-5.15.0-1065-nvidia-ubuntu22.04"]
+    index = image_list._TagIndex(tags)
+    assert image_list._select_versions(["580"], "595", index) == ["580"]
+    assert image_list._select_versions(["latest:2"], "595", index) == ["580"]
+
+
+# ---------------------------------------------------------------------------
+# Discovery
+# ---------------------------------------------------------------------------
+
+def test_reconcile_reports_tag_mismatches():
+    pinned = "nvcr.io/nvidia/cuda@sha256:" + "0" * 64
+    discovered = [
+        image_list._DiscoveredImage("assets/a.yaml", reference="nvcr.io/nvidia/k8s/dcgm-exporter:4.1"),
+        image_list._DiscoveredImage("assets/b.yaml", reference="nvcr.io/nvidia/k8s/dcgm-exporter:4.2"),
+        image_list._DiscoveredImage("assets/c.yaml", reference=pinned),
+    ]
+
+    extra, report = image_list._reconcile_discovered_images(
+        discovered, {}, ["nvcr.io/nvidia/k8s/dcgm-exporter:4.1", "nvcr.io/nvidia/cuda:12.9"]
+    )
+
+    assert [entry.reference for entry in extra] == ["nvcr.io/nvidia/k8s/dcgm-exporter:4.2", pinned]
+    assert extra[1].component == "cuda"
+    assert report == [
+        "nvcr.io/nvidia/k8s/dcgm-exporter:4.2 found in assets/b.yaml but values.yaml lists "
+        "nvcr.io/nvidia/k8s/dcgm-exporter:4.1",
+        f"{pinned} found in assets/c.yaml but values.yaml lists nvcr.io/nvidia/cuda:12.9",
+    ]
+
+
+def test_discover_rejects_missing_paths(tmp_path):
+    missing = str(tmp_path / "missing")
+    with pytest.raises(SystemExit):
+        image_list._parse_args(["--discover", "--discover-path", missing])
+    with pytest.raises(ValueError, match="does not exist"):
+        image_list.ImageListGenerator(skip_registry=True, discover=True, discover_path=missing)
+
+
+# ---------------------------------------------------------------------------
+# Output formats
+# ---------------------------------------------------------------------------
+
+_ENTRIES = sorted([
+    image_list._image_entry("nvcr.io/nvidia/driver:595.58.03-ubuntu22.04", "driver", "os-variant"),
+    image_list._image_entry("nvcr.io/nvidia/gpu-operator:v26.3.0", "operator", "app-version"),
+    image_list._image_entry("registry.k8s.io/nfd/node-feature-discovery:v0.18.2",
+                            "node-feature-discovery.image", "values"),
+])
+
+
+@pytest.mark.parametrize("output_format", sorted(image_list.OUTPUT_FORMATS))
+def test_previous_entries_round_trip(tmp_path, output_format):
+    path = tmp_path / f"images{image_list.OUTPUT_FORMATS[output_format]}"
+    path.write_text(image_list._format_entries(_ENTRIES, output_format))
+
+    loaded = image_list._load_previous_entries(str(path))
+
+    assert sorted(entry.reference for entry in loaded) == [entry.reference for entry in _ENTRIES]
+    if output_format in ("json", "yaml", "csv"):
+        assert sorted(loaded) == _ENTRIES
+
+
+def test_previous_entries_tolerate_platform_annotations(tmp_path):
+    platforms = {entry.reference: ["linux/amd64"] for entry in _ENTRIES}
+    for output_format in ("json", "yaml", "csv"):
+        path = tmp_path / f"images{image_list.OUTPUT_FORMATS[output_format]}"
+        path.write_text(image_list._format_entries(_ENTRIES, output_format, platforms))
+        assert sorted(image_list._load_previous_entries(str(path))) == _ENTRIES
+
+
+def test_batch_diff_against_directory(values_file, tmp_path, capsys):
+    overlays = tmp_path / "overlays"
+    overlays.mkdir()
+    (overlays / "old.yaml").write_text("driver:\n  version: 580.95.05\n")
+    (overlays / "new.yaml").write_text("driver:\n  version: 570.172.08\n")
+    previous = tmp_path / "previous"
+    previous.mkdir()
+    (previous / "old.txt").write_text("nvcr.io/nvidia/driver:580.82.07\n")
+    argv = ["--values", values_file, "--no-nfd", "--skip-registry",
+            "--overlay", str(overlays / "old.yaml"), "--overlay", str(overlays / "new.yaml"),
+            "--output-dir", str(tmp_path / "out")]
+
+    with pytest.raises(SystemExit):
+        image_list._parse_args([*argv, "--diff-against", str(previous / "old.txt")])
+    assert "is not a directory" in capsys.readouterr().err
+
+    image_list.main([*argv, "--diff-against", str(previous)])
+
+    assert "previous/new.txt not found" in capsys.readouterr().err
+    old_diff = (tmp_path / "out" / "old.txt").read_text()
+    assert "+ nvcr.io/nvidia/driver:580.95.05" in old_diff
+    assert "- nvcr.io/nvidia/driver:580.82.07" in old_diff
+    assert "+ nvcr.io/nvidia/driver:570.172.08" in (tmp_path / "out" / "new.txt").read_text()
+
+
+# ---------------------------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------------------------
+
+def test_write_atomic_leaves_no_temp_file(tmp_path, monkeypatch):
+    path = tmp_path / "entry.json"
+    image_list._write_atomic(str(path), b"old")
+
+    def failing_replace(source: str, destination: str) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(image_list.os, "replace", failing_replace)
+
+    with pytest.raises(OSError):
+        image_list._write_atomic(str(path), b"new")
+
+    assert os.listdir(tmp_path) == ["entry.json"] and path.read_bytes() == b"old"
+
+
+@pytest.fixture
+def cached_run(registry, tmp_path, capsys):
+    """Run the command line against the stand-in registry with a cache; return stderr."""
+    registry.add_image("nvidia/driver", "595.58.03-ubuntu22.04")
+    (tmp_path / "values.yaml").write_text(
+        f"operator:\n  repository: {registry.host}/nvidia\n  image: gpu-operator\n"
+        f"driver:\n  repository: {registry.host}/nvidia\n  image: driver\n  version: 595.58.03\n"
+    )
+    (tmp_path / "Chart.yaml").write_text("apiVersion: v2\nname: gpu-operator\nappVersion: v26.3.0\n")
+    argv = ["--values", str(tmp_path / "values.yaml"), "--chart", str(tmp_path / "Chart.yaml"),
+            "--no-nfd", "--insecure-registry", registry.host, "--retries", "0",
+            "--cache-dir", str(tmp_path / "cache"), "--output", str(tmp_path / "images.txt")]
+
+    def run(*extra_args: str) -> str:
+        registry.reset_counters()
+        image_list.main([*argv, *extra_args])
+        return capsys.readouterr().err
+
+    return run
+
+
+def test_result_cache_replays_unchanged_runs(cached_run, registry, tmp_path):
+    assert "no previous result" in cached_run()
+    output = tmp_path / "images.txt"
+    expected = output.read_text()
+    output.unlink()
+
+    assert "reused 1 output(s)" in cached_run()
+    assert registry.requests == []
+    assert output.read_text() == expected
+    assert f"{registry.host}/nvidia/driver:595.58.03-ubuntu22.04" in expected
+
+
+def test_result_cache_explains_recomputes(cached_run, registry, tmp_path):
+    cached_run()
+
+    (tmp_path / "values.yaml").write_text((tmp_path / "values.yaml").read_text() + "gds:\n  enabled: false\n")
+    assert f"{tmp_path / 'values.yaml'} changed" in cached_run()
+    assert "--os changed" in cached_run("--os", "ubuntu22.04")
+    assert "--os changed" in cached_run()
+    assert "(--refresh)" in cached_run("--refresh")
+    assert registry.counts["tags"] == 0  # recomputed from the still fresh tag cache
+    assert "result is 0s old (--cache-ttl 0)" in cached_run("--cache-ttl", "0")
+    assert "reused" in cached_run()
+
+    # Another run refreshes the shared tag cache after a new tag is published
+    registry.add_image("nvidia/driver", "595.58.03-rhel9.4")
+    cached_run("--cache-ttl", "0", "--output", str(tmp_path / "other.txt"))
+    assert f"tag list for {registry.host}/nvidia/driver changed" in cached_run()
+    assert "595.58.03-rhel9.4" in (tmp_path / "images.txt").read_text()
+
+
+def test_result_cache_skips_runs_with_lookup_failures(cached_run, registry):
+    registry.fail_statuses = [503] * 10
+    assert "not storing this run (1 registry lookups failed)" in cached_run()
+    registry.fail_statuses.clear()
+    assert "no previous result" in cached_run()
+    assert "reused" in cached_run()
+
+
+# ---------------------------------------------------------------------------
+# Library session and serve
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def values_file(tmp_path):
+    path = tmp_path / "values.yaml"
+    path.write_text(
+        "operator:\n  repository: nvcr.io/nvidia\n  image: gpu-operator\n"
+        "driver:\n  repository: nvcr.io/nvidia\n  image: driver\n  version: 595.58.03\n"
+    )
+    return str(path)
+
+
+def test_public_api_lists_images(values_file):
+    result = image_list.generate_image_list(
+        {"driver": {"version": "580.95.05"}}, values=values_file, no_nfd=True, skip_registry=True
+    )
+
+    assert "nvcr.io/nvidia/driver:580.95.05" in result.images
+    assert all(type(entry) is image_list.ImageEntry for entry in result.entries)
+    assert result.format() == "".join(f"{reference}\n" for reference in result.images)
+
+
+def test_session_wraps_string_list_options(values_file):
+    with image_list._ImageListSession.from_options(
+        values=values_file, no_nfd=True, skip_registry=True, os="ubuntu22.04"
+    ) as session:
+        assert session.args.os == ["ubuntu22.04"]
+        assert session.options(exclude_os="rhel*").exclude_os == ["rhel*"]
+
+
+def test_session_request_rejects_server_paths(tmp_path):
+    for request in ({"values": "/etc/passwd"}, {"chart": "Chart.yaml"}, {"nodes-json": "n.json"}):
+        with pytest.raises(ValueError):
+            image_list._session_request(request, "text")
+    with pytest.raises(ValueError, match="--overlay-dir"):
+        image_list._session_request({"overlay": "/etc/passwd"}, "text")
+
+    (tmp_path / "ubuntu.yaml").write_text("driver:\n  version: 580.95.05\n")
+    overlay, _, _ = image_list._session_request({"overlay": ["ubuntu.yaml"]}, "text", str(tmp_path))
+    assert overlay == str(tmp_path / "ubuntu.yaml")
+    for name in ("../values.yaml", "/etc/passwd", "missing.yaml"):
+        with pytest.raises(ValueError):
+            image_list._session_request({"overlay": name}, "text", str(tmp_path))
+
+
+def test_load_yaml_rejects_non_mapping(tmp_path):
+    path = tmp_path / "list.yaml"
+    path.write_text("- a\n- b\n")
+    with pytest.raises(ValueError, match="expected a YAML mapping"):
+        image_list._load_overlay(str(path))
+
+
+def test_serve_answers_json_overlays(values_file, tmp_path):
+    (tmp_path / "overlays").mkdir()
+    (tmp_path / "overlays" / "bad.yaml").write_text("just a string\n")
+    session = image_list._ImageListSession.from_options(values=values_file, no_nfd=True, skip_registry=True)
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), image_list._session_handler(session, "text", str(tmp_path / "overlays"))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def fetch(path: str, body: dict | None = None) -> tuple[int, str]:
+        request = urllib.request.Request(base_url + path, json.dumps(body).encode() if body else None)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode()
+
+    try:
+        status, text = fetch("/images", {"overlay": {"driver": {"version": "580.95.05"}}})
+        assert status == 200 and "nvcr.io/nvidia/driver:580.95.05" in text
+        assert fetch("/images?values=/etc/passwd")[0] == 400
+        assert fetch("/images?overlay=bad.yaml")[0] == 400
+        assert fetch("/images?overlay=../values.yaml")[0] == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        session.close()